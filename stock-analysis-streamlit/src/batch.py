@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from best_buy import Profit
+from portfolio_sim import calculate_portfolio_returns
+from sma import prepared_close, sma_sliding
+from upward_downward import getTrends, processTrendData
+from us_inflation import slope_ols
+from utils.adjust import dividend_factors
+from utils.history import download_history, history_key, select
+from utils.resample import resample_ohlcv
+from utils.risk import risk_metrics
+
+# ----------------------------
+# Headless batch runner.
+# Runs the page analyses over a CSV of tickers without a browser session: each ticker's history
+# comes from an on-disk cache or the data provider, the analyses run in a process pool, and every
+# result table is written once, in bulk, as a columnar file (parquet, or csv).
+#
+# Input CSV, one row per ticker; only `ticker` is required:
+#   ticker     symbol, e.g. AAPL
+#   start,end  date range (default: --start/--end)
+#   interval   1d, 1wk, 1mo or 3mo (default: --interval); coarser bars are resampled from daily
+#   window     SMA window in bars (default: --window)
+#   portfolio  portfolio name; rows sharing a name are simulated together
+#   weight     the ticker's weight in its portfolio (weights are normalised to sum to 1)
+#
+#   python src/batch.py tickers.csv --out results --analyses sma,trend,profit,slope,portfolio
+# ----------------------------
+
+ANALYSES = ["sma", "trend", "profit", "slope", "portfolio"]
+INTERVALS = ["1d", "1wk", "1mo", "3mo"]
+FORMATS = ["parquet", "csv"]
+# Every table a run can write: one per analysis, the trend segments, and the errors.
+TABLES = ANALYSES + ["trend_segments", "errors"]
+
+
+# Read and validate the ticker list, filling the per-row parameters from the command-line defaults.
+def read_requests(path: str, start: datetime.date, end: datetime.date, interval: str, window: int) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype=str, skipinitialspace=True)
+    df.columns = [c.strip().lower() for c in df.columns]
+    if "ticker" not in df.columns:
+        raise ValueError(f"{path}: missing required 'ticker' column")
+    df["ticker"] = df["ticker"].str.strip().str.upper()
+    df = df[df["ticker"].notna() & (df["ticker"] != "")].copy()
+    defaults = {"start": start, "end": end, "interval": interval, "window": window, "portfolio": None, "weight": None}
+    for col, default in defaults.items():
+        if col not in df.columns:
+            df[col] = default
+        else:
+            df[col] = df[col].where(df[col].notna() & (df[col].str.strip() != ""), default)
+    df["start"] = pd.to_datetime(df["start"]).dt.date
+    df["end"] = pd.to_datetime(df["end"]).dt.date
+    df["window"] = df["window"].astype(int)
+    df["weight"] = pd.to_numeric(df["weight"])
+    bad = sorted(set(df["interval"]) - set(INTERVALS))
+    if bad:
+        raise ValueError(f"{path}: unknown interval(s) {bad}; expected one of {INTERVALS}")
+    if (df["window"] <= 0).any():
+        raise ValueError(f"{path}: window must be positive")
+    if (df["start"] >= df["end"]).any():
+        raise ValueError(f"{path}: start must be before end")
+    return df.reset_index(drop=True)
+
+
+# One file per ticker and day, like the in-app history cache (utils/history.py).
+def cache_path(cache_dir: str, ticker: str) -> str:
+    provider, _, ticker, day = history_key(ticker)
+    return os.path.join(cache_dir, provider, f"{ticker}_{day}.parquet")
+
+
+# A ticker's full unadjusted daily history, from the cache when it has today's copy.
+def load_history(ticker: str, cache_dir: str | None = None) -> pd.DataFrame:
+    path = cache_path(cache_dir, ticker) if cache_dir else None
+    if path and os.path.exists(path):
+        return pd.read_parquet(path)
+    df = download_history(ticker)
+    if path and not df.empty:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a concurrent worker never reads a half-written file.
+        tmp = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, path)
+    return df
+
+
+# Dividend-adjusted OHLCV bars for one ticker in [start, end), as a single-level frame.
+# Only daily bars are fetched and cached; weekly/monthly bars are resampled from them.
+def load_bars(ticker: str, start, end, interval: str = "1d", cache_dir: str | None = None) -> pd.DataFrame:
+    df = load_history(ticker, cache_dir)
+    df = select(df, dividend_factors(df["Close"], df["Dividends"]), True, start, end)
+    df = df.drop(columns=["Dividends", "Stock Splits"])
+    if interval != "1d" and not df.empty:
+        df = resample_ohlcv(df, interval)
+    return df
+
+
+# ----------------------------
+# Analyses. Each takes the ticker's bars and returns its rows of a result table.
+# ----------------------------
+def run_sma(ticker: str, df: pd.DataFrame, close: np.ndarray, start: int, window: int) -> pd.DataFrame:
+    return pd.DataFrame({"ticker": ticker, "date": df.index[start:], "close": close,
+                         "sma": sma_sliding(close, window), "window": window})
+
+
+def run_trend(ticker: str, df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    wide = df[["Close"]].dropna()
+    wide.columns = pd.MultiIndex.from_tuples([("Close", ticker)])
+    # getTrends/processTrendData narrate every bar to stdout for the page's console log.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        trends = getTrends("Close", ticker, wide)
+        highest_up, highest_down, total_up, total_down = processTrendData(trends)
+    segments = [{"ticker": ticker, "direction": t["direction"], "start": t["start"], "end": t["end"],
+                 "bars": len(t["values"]), "change": t["values"][-1] / t["values"][0] - 1}
+                for t in trends if t["direction"]]
+    summary = {"ticker": ticker, "up_trends": total_up, "down_trends": total_down}
+    for name, trend in (("up", highest_up), ("down", highest_down)):
+        summary[f"longest_{name}_start"] = trend.get("start")
+        summary[f"longest_{name}_end"] = trend.get("end")
+        summary[f"longest_{name}_bars"] = len(trend["values"])
+    return pd.DataFrame([summary]), pd.DataFrame(segments)
+
+
+def run_profit(ticker: str, df: pd.DataFrame, close: np.ndarray, start: int) -> pd.DataFrame:
+    total, trades = Profit(close.tolist(), list(df.index[start:]))
+    return pd.DataFrame([{"ticker": ticker, "total_profit": total, "trades": len(trades),
+                          "profit_pct": total / close[0]}])
+
+
+# OLS slope of the close (price units per bar) and of its log (average growth rate per bar).
+def run_slope(ticker: str, close: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame([{"ticker": ticker, "bars": len(close), "slope": slope_ols(close),
+                          "log_slope": slope_ols(np.log(close))}])
+
+
+def error_table(ticker: str, analysis: str, error: Exception) -> pd.DataFrame:
+    return pd.DataFrame([{"ticker": ticker, "analysis": analysis, "error": str(error)}])
+
+
+# Worker entry point: fetch one ticker and run every selected per-ticker analysis on it.
+# Returns {table name: this ticker's rows}. Failures become rows of the "errors" table instead
+# of stopping the batch.
+def analyse_ticker(task: tuple) -> dict:
+    ticker, start, end, interval, window, analyses, cache_dir = task
+    try:
+        df = load_bars(ticker, start, end, interval, cache_dir)
+        df, first, close = prepared_close(df, ticker)
+    except Exception as e:
+        return {"errors": error_table(ticker, "fetch", e)}
+    tables = {}
+    for name in analyses:
+        try:
+            if name == "sma":
+                tables["sma"] = run_sma(ticker, df, close, first, window)
+            elif name == "trend":
+                tables["trend"], tables["trend_segments"] = run_trend(ticker, df)
+            elif name == "profit":
+                tables["profit"] = run_profit(ticker, df, close, first)
+            elif name == "slope":
+                tables["slope"] = run_slope(ticker, close)
+        except Exception as e:
+            tables["errors"] = pd.concat([tables.get("errors"), error_table(ticker, name, e)])
+    return tables
+
+
+# Worker entry point: simulate one portfolio and summarise its risk (see utils/risk.py).
+def analyse_portfolio(task: tuple) -> dict:
+    name, weights, start, end, balance, cache_dir = task
+    try:
+        closes = {t: load_bars(t, start, end, "1d", cache_dir)["Close"] for t in weights}
+        data = pd.concat(closes, axis=1)
+        returns, portfolio_value = calculate_portfolio_returns(data, weights, balance)
+        if returns.empty:
+            raise ValueError("no overlapping bars for the portfolio's tickers")
+        metrics = risk_metrics(returns[["Portfolio"]].to_numpy())
+    except Exception as e:
+        return {"errors": error_table(",".join(weights), f"portfolio {name}", e)}
+    row = {"portfolio": name, "tickers": ",".join(weights), "start": start, "end": end,
+           "starting_balance": balance, "final_value": portfolio_value.iloc[-1]}
+    row.update({metric: float(values[0]) for metric, values in metrics.items()})
+    return {"portfolio": pd.DataFrame([row])}
+
+
+def portfolio_tasks(requests: pd.DataFrame, balance: float, cache_dir: str | None) -> list[tuple]:
+    tasks = []
+    for name, group in requests[requests["portfolio"].notna()].groupby("portfolio", sort=False):
+        weights = group.groupby("ticker", sort=False)["weight"].sum(min_count=1)
+        # Without weights the portfolio is equal-weighted.
+        weights = weights.fillna(1.0) if weights.isna().all() else weights.fillna(0.0)
+        weights = weights[weights > 0] / weights[weights > 0].sum()
+        tasks.append((name, weights.to_dict(), group["start"].min(), group["end"].max(), balance, cache_dir))
+    return tasks
+
+
+# Map `fn` over `tasks`, inline for one worker, else in a process pool. Yields results in order.
+def run_pool(fn, tasks: list, workers: int):
+    if workers <= 1 or len(tasks) <= 1:
+        yield from map(fn, tasks)
+        return
+    # "spawn", as in utils/backtest.py: forking a threaded (Streamlit/yfinance) process is unsafe.
+    ctx = multiprocessing.get_context("spawn")
+    # Batch the tasks so thousands of tickers don't cost thousands of round trips.
+    chunksize = max(1, len(tasks) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        yield from pool.map(fn, tasks, chunksize=chunksize)
+
+
+# Concatenate each table's per-task pieces and write it as one file. The errors table is always
+# written, so a clean run leaves an empty one behind rather than a stale one from a previous run;
+# tables this run did not produce are removed from `out_dir` (in either format) for the same reason.
+def write_tables(tables: dict, out_dir: str, fmt: str) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    tables.setdefault("errors", [])
+    for name in TABLES:
+        for ext in FORMATS:
+            path = os.path.join(out_dir, f"{name}.{ext}")
+            if (name not in tables or ext != fmt) and os.path.exists(path):
+                os.remove(path)
+    for name, parts in tables.items():
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["ticker", "analysis", "error"])
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        if fmt == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+        written[name] = (path, len(df))
+    return written
+
+
+def main(argv: list[str] | None = None) -> int:
+    today = datetime.date.today()
+    parser = argparse.ArgumentParser(description="Run the stock analyses over a CSV of tickers, without the UI.")
+    parser.add_argument("tickers", help="CSV with a 'ticker' column and optional per-row parameters")
+    parser.add_argument("--out", default="batch-results", help="directory for the result tables")
+    parser.add_argument("--analyses", default=",".join(ANALYSES), help="comma-separated analyses to run")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=today - datetime.timedelta(days=365))
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=today + datetime.timedelta(days=1))
+    parser.add_argument("--interval", default="1d", choices=INTERVALS)
+    parser.add_argument("--window", type=int, default=20, help="default SMA window")
+    parser.add_argument("--balance", type=float, default=100000, help="starting balance for portfolios")
+    parser.add_argument("--cache", default=None, help="directory caching downloaded daily bars between runs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--format", default="parquet", choices=FORMATS, help="output file format")
+    args = parser.parse_args(argv)
+
+    analyses = [a.strip() for a in args.analyses.split(",") if a.strip()]
+    unknown = [a for a in analyses if a not in ANALYSES]
+    if unknown:
+        parser.error(f"unknown analysis(es) {unknown}; expected {ANALYSES}")
+    try:
+        requests = read_requests(args.tickers, args.start, args.end, args.interval, args.window)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    t0 = time.perf_counter()
+    tables = {}
+    per_ticker = [a for a in analyses if a != "portfolio"]
+    if per_ticker:
+        tasks = [(r.ticker, r.start, r.end, r.interval, r.window, per_ticker, args.cache)
+                 for r in requests.itertuples()]
+        for i, result in enumerate(run_pool(analyse_ticker, tasks, args.workers), 1):
+            for name, part in result.items():
+                tables.setdefault(name, []).append(part)
+            if i % 100 == 0 or i == len(tasks):
+                print(f"{i}/{len(tasks)} tickers analysed", flush=True)
+    if "portfolio" in analyses:
+        tasks = portfolio_tasks(requests, args.balance, args.cache)
+        for result in run_pool(analyse_portfolio, tasks, args.workers):
+            for name, part in result.items():
+                tables.setdefault(name, []).append(part)
+        print(f"{len(tasks)} portfolios simulated", flush=True)
+
+    written = write_tables(tables, args.out, args.format)
+    for name, (path, rows) in written.items():
+        print(f"{name}: {rows} rows -> {path}")
+    errors = written["errors"][1]
+    print(f"Done in {time.perf_counter() - t0:.1f}s, {errors} errors")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,8 @@
 import streamlit as st
-import yfinance as yf
 import pandas
 from datetime import date, timedelta
 import streamlit as st
+from utils.history import history_view, raw_history
 
 #Set Global Variables
 target_stocks = ["MSFT","ABNB","AMZN","AAPL","TSLA"]
@@ -60,15 +60,42 @@ def Profit(prices,dates):
         profit_information.append(f"Buy at {lowest_price} on {lowprice_date}, Sell at {highest_price} on {highprice_date}")
   return total_profit, profit_information
 
+#Suggest similar tickers in col for a stock that could not be found
+def SuggestStock(stock_name,col):
+    recommended_search = []
+    #Compare the in put stock with the 5 set of stocks
+    for i in range(len(target_stocks)):
+      dist = LevenshteinDistance(target_stocks[i], stock_name.upper())
+      #If the distance is less than (set 3 as of now)
+      maximum_distance_difference = 3
+      if dist < maximum_distance_difference:
+          recommended_search.append(target_stocks[i])
+
+    output = ""
+    #Formatting the output
+    for i in range (len(recommended_search)):
+        output += f"{recommended_search[i]}?"
+        if i < (len(recommended_search)-1):
+             output+=" or "
+    with col:
+      if output:
+          st.write(f"Maybe you meant {output}")
+      else:
+          st.write("No Stock Ticker Found!")
+
 def SearchStock(stock_name,start_date,end_date,main_container):
     col1,col2,col3= main_container.columns([3,2,1])
     dates = ""
     prices = []
     try:
-      #Search for stock with yf ticker with user start and end dates
-      stock = yf.Ticker(stock_name)
-      stock_history = stock.history(start=start_date,end=end_date)
-      
+      #Search for stock history with user start and end dates (cut from one shared copy across sessions)
+      history = raw_history(stock_name)
+      #Unknown tickers have no history at all; suggest similar tickers instead
+      if history.frame().empty:
+        SuggestStock(stock_name,col2)
+        return
+      stock_history = history_view(history,True,start=start_date,end=end_date)
+
       #Get Close values as prices and format to 2dp
       prices = pandas.DataFrame(stock_history).get("Close").tolist()
       prices = [round(float(i), 2) for i in prices]
@@ -97,26 +124,7 @@ def SearchStock(stock_name,start_date,end_date,main_container):
           st.write("No profit")
 
     except AttributeError:
-      recommended_search = []
-        #Compare the in put stock with the 5 set of stocks
-      for i in range(len(target_stocks)):
-        dist = LevenshteinDistance(target_stocks[i], stock_name.upper())
-        #If the distance is less than (set 3 as of now)
-        maximum_distance_difference = 3
-        if dist < maximum_distance_difference:
-            recommended_search.append(target_stocks[i])
-
-      output = ""
-      #Formatting the output
-      for i in range (len(recommended_search)):
-          output += f"{recommended_search[i]}?"
-          if i < (len(recommended_search)-1):
-               output+=" or "
-      with col2:
-        if output:
-            st.write(f"Maybe you meant {output}")
-        else:
-            st.write("No Stock Ticker Found!")
+      SuggestStock(stock_name,col2)
     except:
         with col2: 
             st.write("Invalid Stock Ticker!")
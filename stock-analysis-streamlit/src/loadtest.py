@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# ----------------------------
+# Headless load test for app.py.
+# Drives each page through scripted widget interactions with Streamlit's AppTest API against
+# the synthetic data provider, running N sessions concurrently inside this one process (as the
+# Streamlit server would), and writes p50/p95/p99 latency, throughput and memory to JSON.
+#
+# AppTest keeps a single global Runtime, so script runs are serialised behind a lock; only
+# background jobs (downloads, simulations) overlap. A real server runs scripts of different
+# sessions in parallel threads, so with several sessions the latencies here are dominated by
+# queueing for the lock and overstate what users would see. The report says so
+# ("serialised_runs") and gives the time each interaction spent waiting ("lock_wait_ms"), so
+# compare runs with the same session count, or use --sessions 1 for script cost alone.
+#
+#   python src/loadtest.py --sessions 8 --iterations 5 --out loadtest.json
+# ----------------------------
+
+# Must be set before the app (and utils.providers) is first imported.
+os.environ.setdefault("STOCK_DATA_PROVIDER", "synthetic")
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from utils.shared_store import get_store  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PAGES = ["Portfolio", "SMA", "Upward/Downward", "Best Buy", "Inflation analyzer"]
+# Tickers the scripted interactions rotate through, so sessions don't all ask for the same one.
+TICKERS = ["AAPL", "MSFT", "AMZN", "TSLA", "NVDA", "GOOG", "META", "ABNB"]
+
+_run_lock = threading.Lock()
+# Seconds each thread has spent waiting for _run_lock.
+_lock_wait = threading.local()
+
+
+def run(at: AppTest) -> None:
+    t0 = time.perf_counter()
+    with _run_lock:
+        _lock_wait.total = lock_wait() + time.perf_counter() - t0
+        at.run()
+
+
+def lock_wait() -> float:
+    return getattr(_lock_wait, "total", 0.0)
+
+
+# Rerun until every background job of the session has finished, then once more to render it.
+def settle(at: AppTest, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    run(at)
+    while True:
+        jobs = at.session_state["_jobs"] if "_jobs" in at.session_state else {}
+        if not any(j.running for j in jobs.values()):
+            run(at)
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError("background jobs did not finish in time")
+        time.sleep(0.02)
+        run(at)
+
+
+# ----------------------------
+# Scripted interactions: one "user action" per page, from clicking the page to seeing results.
+# Drivers only set widget values; the harness runs the script afterwards.
+# ----------------------------
+def drive_sma(at: AppTest, ticker: str, i: int) -> None:
+    at.text_input[0].input(ticker)
+    at.selectbox[0].set_value(["3mo", "6mo", "1y", "3y"][i % 4])
+    at.number_input[0].set_value(5 + i % 20)
+    at.button[0].click()
+
+
+def drive_trend(at: AppTest, ticker: str, i: int) -> None:
+    today = datetime.date.today()
+    at.date_input[0].set_value((today - datetime.timedelta(days=30 + 30 * (i % 6)), today))
+    at.selectbox[0].set_value(["Daily", "weekly", "Monthly"][i % 3])
+    at.text_input[0].input(ticker)
+
+
+def drive_best_buy(at: AppTest, ticker: str, i: int) -> None:
+    today = datetime.date.today()
+    at.date_input[0].set_value((today - datetime.timedelta(days=60 + 30 * (i % 6)), today))
+    at.text_input[0].input(ticker)
+    at.button[0].click()
+
+
+def drive_portfolio(at: AppTest, ticker: str, i: int) -> None:
+    # Rotate the first ticker (never onto another default, which would merge their weights);
+    # weights stay at the page defaults (40/30/20/10).
+    choices = [t for t in TICKERS if t not in ("TSLA", "AMZN", "NVDA")]
+    at.text_input[1].input(choices[i % len(choices)])
+    at.date_input[0].set_value(datetime.date(2020 + i % 4, 1, 1))
+    at.button[0].click()
+
+
+def drive_inflation(at: AppTest, ticker: str, i: int) -> None:
+    pass
+
+
+DRIVERS = {
+    "SMA": drive_sma,
+    "Upward/Downward": drive_trend,
+    "Best Buy": drive_best_buy,
+    "Portfolio": drive_portfolio,
+    "Inflation analyzer": drive_inflation,
+}
+
+
+# Current resident set size of this process in bytes (Linux /proc, else the peak from getrusage).
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        scale = 1 if platform.system() == "Darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class RssSampler:
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.baseline = current_rss()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+# One simulated user: open the app, go to `page`, and repeat the page's interaction.
+# Returns per-interaction latencies and lock waits in seconds, and any error messages.
+def run_session(page: str, session_id: int, iterations: int, timeout: float) -> tuple[list[float], list[float], list[str]]:
+    latencies, waits, errors = [], [], []
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    try:
+        run(at)
+        at.sidebar.radio[0].set_value(page)
+        run(at)
+    except Exception as e:
+        return latencies, waits, [f"session {session_id}: startup failed: {e!r}"]
+    for i in range(iterations):
+        ticker = TICKERS[(session_id + i) % len(TICKERS)]
+        t0, w0 = time.perf_counter(), lock_wait()
+        try:
+            DRIVERS[page](at, ticker, session_id + i)
+            settle(at, timeout)
+        except Exception as e:
+            errors.append(f"session {session_id} iteration {i}: {e!r}")
+            continue
+        latencies.append(time.perf_counter() - t0)
+        waits.append(lock_wait() - w0)
+        errors.extend(f"session {session_id} iteration {i}: {x.value}" for x in at.exception)
+    return latencies, waits, errors
+
+
+# Run `sessions` concurrent users against one page and summarise.
+def load_page(page: str, sessions: int, iterations: int, timeout: float) -> dict:
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=sessions) as pool:
+        t0 = time.perf_counter()
+        results = list(pool.map(lambda s: run_session(page, s, iterations, timeout), range(sessions)))
+        wall = time.perf_counter() - t0
+
+    latencies = np.array([x for lat, _, _ in results for x in lat], dtype=np.float64)
+    waits = np.array([x for _, w, _ in results for x in w], dtype=np.float64)
+    errors = [e for _, _, errs in results for e in errs]
+    p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).tolist() if latencies.size else (None,) * 3
+    w50, w95 = (np.percentile(waits, [50, 95]) * 1000).tolist() if waits.size else (None,) * 2
+    return {
+        "sessions": sessions,
+        "interactions": int(latencies.size),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "latency_ms": {"p50": p50, "p95": p95, "p99": p99,
+                       "max": float(latencies.max() * 1000) if latencies.size else None},
+        # Part of each interaction's latency spent queueing for the AppTest lock.
+        "lock_wait_ms": {"p50": w50, "p95": w95},
+        "lock_wait_share": float(waits.sum() / latencies.sum()) if latencies.sum() > 0 else None,
+        "throughput_per_s": latencies.size / wall if wall > 0 else None,
+        "wall_s": wall,
+        # Sessions share one process, so per-session memory is the page's peak growth split evenly.
+        "peak_rss_mb": rss.peak / 2**20,
+        "peak_rss_per_session_mb": (rss.peak - rss.baseline) / 2**20 / sessions,
+        # Cumulative over the run: how much price data the sessions shared instead of copying.
+        "shared_store": get_store().stats(),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Headless multi-session load test for the Streamlit app.")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions per page")
+    parser.add_argument("--iterations", type=int, default=3, help="interactions per session")
+    parser.add_argument("--pages", default=",".join(PAGES), help="comma-separated pages to test")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per interaction")
+    parser.add_argument("--out", default="loadtest.json", help="where to write the JSON report")
+    args = parser.parse_args(argv)
+
+    pages = [p.strip() for p in args.pages.split(",") if p.strip()]
+    unknown = [p for p in pages if p not in DRIVERS]
+    if unknown:
+        parser.error(f"unknown page(s) {unknown}; expected {PAGES}")
+    if args.sessions < 1 or args.iterations < 1:
+        parser.error("--sessions and --iterations must be at least 1")
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "provider": os.environ["STOCK_DATA_PROVIDER"],
+        "sessions": args.sessions,
+        "iterations": args.iterations,
+        # Script runs of all sessions go one at a time (see the header), unlike a real server.
+        "serialised_runs": True,
+        "pages": {},
+    }
+    # The app reads CPI.txt and writes validateResults.txt relative to the working directory;
+    # run from a scratch copy so the load test never touches the source tree.
+    out_path = os.path.abspath(args.out)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        shutil.copy(os.path.join(os.path.dirname(APP_PATH), "CPI.txt"), workdir)
+        os.chdir(workdir)
+        try:
+            for page in pages:
+                print(f"{page}: {args.sessions} sessions x {args.iterations} interactions...", flush=True)
+                result = load_page(page, args.sessions, args.iterations, args.timeout)
+                report["pages"][page] = result
+                lat, wait = result["latency_ms"], result["lock_wait_ms"]
+                print(f"  p50 {lat['p50'] or float('nan'):.0f} ms, p95 {lat['p95'] or float('nan'):.0f} ms, "
+                      f"p99 {lat['p99'] or float('nan'):.0f} ms (lock wait p50 {wait['p50'] or float('nan'):.0f} ms), "
+                      f"{result['throughput_per_s'] or 0:.2f}/s, "
+                      f"peak RSS {result['peak_rss_mb']:.0f} MB, errors {result['errors']}", flush=True)
+        finally:
+            os.chdir(cwd)
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {out_path}")
+    return 1 if any(r["errors"] for r in report["pages"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,3 @@
-# Source of data
-import yfinance as yf
 # Data handling using panda
 import pandas as pd
 # For calculation of weights and returns
@@ -11,6 +9,14 @@ import matplotlib.pyplot as plt
 # Web app interface
 import streamlit as st
 
+# Source of data: Yahoo Finance, or synthetic bars when running offline
+from us_inflation import CPI_PATH, coverage_note, load_data_from_local, real_factors
+from utils import jobs
+from utils.history import history_view, raw_history
+from utils.providers import get_provider
+from utils.risk import CONFIDENCE, ROLLING_WINDOW, metrics_table, risk_metrics, rolling_correlation, rolling_volatility
+from utils.shared_store import share_frame
+
 
 def get_user_profile():
     # Header for the page
@@ -56,27 +62,79 @@ def get_portfolio_allocation():
     # Warning prompt if total don't add up to 100%
     total_weight = sum(portfolio.values())
 
-    if total_weight != 1:
+    if not np.isclose(total_weight, 1):
         st.warning(f"Your total weights sum to {total_weight * 100:.1f}%. Please adjust to 100%.")
         return
     return portfolio
 
 
-def fetch_portfolio_data(portfolio, start_date, end_date):
+# Background job: download closing prices one ticker at a time so progress can be shown
+# and a cancelled fetch resumes from the next ticker. No st.* calls in here.
+# The price matrix goes into the process-wide shared store, so sessions simulating the same
+# tickers and dates hold views of one read-only copy.
+def download_closes(job, tickers, start_date, end_date):
+    def download_one(ticker):
+        # Dividend-adjusted closes, cut from the ticker's shared history
+        return history_view(raw_history(ticker), True, start=start_date, end=end_date)["Close"].rename(ticker)
+
+    def build():
+        closes = jobs.run_items(job, tickers, download_one, "Downloading")
+        return pd.concat(list(closes.values()), axis=1)
+
+    return share_frame(price_key(tickers, start_date, end_date), build)
+
+
+def price_key(tickers, start_date, end_date):
+    return (get_provider().name, "closes", tuple(tickers), start_date, end_date)
+
+
+# Background job: the whole simulation, from the download to the risk metrics, so clicking
+# "Simulate Portfolio" never blocks the page. No st.* calls in here; display_results draws the
+# returned dict on the script thread. Returns None when no prices came back, or no day has prices
+# for every ticker (e.g. one of them is unknown), so there are no returns to simulate.
+def simulate_portfolio(job, portfolio, starting_balance, start_date, end_date, real):
     tickers = list(portfolio.keys())
-    st.write(f"Fetching data for: {', '.join(tickers)}...")
-    # Download closing prices, yfiance automatically adjusts the historical price
-    data = yf.download(tickers, start=start_date, end=end_date)["Close"]
-    # Warning message for empty data
+    data = download_closes(job, tickers, start_date, end_date).frame()
     if data.empty:
-        st.error("⚠️ No data retrieved. Try adjusting the tickers or date range.")
-        return
-    return data
+        return None
+    job.report(len(tickers), len(tickers), "Simulating")
+    shared_key = price_key(tickers, start_date, end_date)
+    if real:
+        data, shared_key = deflate(data, shared_key)
+    returns, portfolio_value = calculate_portfolio_returns(data, portfolio, starting_balance, shared_key=shared_key)
+    if returns.empty:
+        return None
+    # Performance and risk metrics for every ticker and the portfolio in one pass over the
+    # return matrix (the Portfolio is the last column).
+    matrix = returns.to_numpy()
+    return {
+        "data": data,
+        "returns": returns,
+        "portfolio_value": portfolio_value,
+        "metrics": risk_metrics(matrix),
+        "rolling_volatility": pd.DataFrame(rolling_volatility(matrix), index=returns.index, columns=returns.columns),
+        "rolling_correlation": pd.DataFrame(rolling_correlation(matrix), index=returns.index, columns=returns.columns),
+        "real": real,
+    }
+
+
+# Real prices: every ticker's closes times the CPI deflator of their dates, one multiply over
+# the whole matrix. Returns the real prices and the shared key their derived data lives under,
+# which follows the CPI file version.
+def deflate(data, shared_key):
+    factors, real_key = real_factors(shared_key, data.index)
+    real = pd.DataFrame(data.to_numpy() * factors[:, None], index=data.index, columns=data.columns)
+    return real, real_key
 
 
-def calculate_portfolio_returns(data, portfolio, starting_balance):
+def calculate_portfolio_returns(data, portfolio, starting_balance, shared_key=None):
     # Panda method to compute daily returns, dropping rows with missing values.
-    returns = data.pct_change().dropna()
+    # Per-ticker returns don't depend on the user's weights, so with a shared_key they are
+    # computed once and shared; only the Portfolio column below is session-specific.
+    if shared_key is None:
+        returns = data.pct_change().dropna()
+    else:
+        returns = share_frame((shared_key, "returns"), lambda: data.pct_change().dropna()).frame()
     # Weighted portfolio daily return
     # Converts the weights into a numpy array
     weights_arr = np.array(list(portfolio.values()))
@@ -89,7 +147,14 @@ def calculate_portfolio_returns(data, portfolio, starting_balance):
     return returns, portfolio_value
 
 
-def display_results(title, name, data, returns, portfolio_value):
+def display_results(title, name, result):
+    data, returns, portfolio_value = result["data"], result["returns"], result["portfolio_value"]
+    if result["real"]:
+        st.caption(f"Real values, in dollars of {data.index[0]:%d %b %Y}.")
+        note = coverage_note(data.index)
+        if note:
+            st.caption(note)
+
     # Display latest stock values from the last 5 days
     st.write("Latest Stock Values")
     st.dataframe(data.tail())
@@ -114,19 +179,35 @@ def display_results(title, name, data, returns, portfolio_value):
     ax.set_ylabel("Frequency")
     st.pyplot(fig)
 
-    # Calculating performance metrics
+    # Performance and risk metrics, computed by the simulation job
+    metrics = result["metrics"]
     # Average Daily Return
-    avg_return = returns["Portfolio"].mean() * 100
+    avg_return = metrics["mean"][-1] * 100
     # How much daily returns fluctuate
-    volatility = returns["Portfolio"].std() * 100
-    # Overall gain/loss since start date
-    total_return = (portfolio_value.iloc[-1] / portfolio_value.iloc[0] - 1) * 100
+    volatility = metrics["volatility"][-1] * 100
+    # Overall gain/loss since the starting balance
+    total_return = metrics["total_return"][-1] * 100
 
     # Display performance metrics
     st.metric("Average Daily Return", f"{avg_return:.3f}%")
     st.metric("Volatility (Std Dev)", f"{volatility:.3f}%")
     st.metric("Total Portfolio Return", f"{total_return:.2f}%")
-    st.metric("Latest Portfolio Value", f"${portfolio_value[-1]:.2f}")
+    st.metric("Latest Portfolio Value", f"${portfolio_value.iloc[-1]:.2f}")
+    st.metric("Max Drawdown", f"{metrics['max_drawdown'][-1]:.2%}",
+              help=f"Longest time below a previous peak: {metrics['max_drawdown_duration'][-1]:.0f} trading days")
+    st.metric(f"Daily VaR ({CONFIDENCE:.0%})", f"{metrics['var_historical'][-1]:.2%}",
+              help=f"Expected loss beyond it (CVaR): {metrics['cvar_historical'][-1]:.2%}")
+    st.metric("Sharpe Ratio", f"{metrics['sharpe'][-1]:.2f}")
+
+    # Same metrics side by side for each ticker
+    st.subheader("Risk Metrics")
+    st.dataframe(metrics_table(returns, metrics), use_container_width=True)
+
+    # Rolling risk over roughly one trading month
+    st.subheader(f"Rolling Volatility ({ROLLING_WINDOW} days)")
+    st.line_chart(result["rolling_volatility"].dropna(), use_container_width=True)
+    st.subheader(f"Rolling Correlation with Portfolio ({ROLLING_WINDOW} days)")
+    st.line_chart(result["rolling_correlation"].drop(columns="Portfolio").dropna(), use_container_width=True)
 
     # --- User Summary ---
     st.success(f"Simulation complete for {title} {name}.")
@@ -141,10 +222,29 @@ def user_portfolio():
     # Select date range for stock data
     start_date = st.date_input("Start Date", pd.to_datetime("2022-01-01"))
     end_date = st.date_input("End Date", pd.to_datetime("today"))
+    # Applied to the downloaded prices on every rerun, so toggling it never refetches.
+    real = st.checkbox("Inflation-adjusted (real) values",
+                       help="Deflate prices by the monthly CPI in CPI.txt, in dollars of the start date")
 
-    # Fetch stock data from Yahoo Finance upon clicking the button
+    # Fetch stock data from Yahoo Finance upon clicking the button.
+    # The request is kept in the session so the simulation survives later reruns.
     if st.button("Simulate Portfolio"):
-        data = fetch_portfolio_data(portfolio, start_date, end_date)
-        if data is not None:
-            returns, portfolio_value = calculate_portfolio_returns(data, portfolio, balance)
-            display_results(title, name, data, returns, portfolio_value)
+        st.session_state["portfolio_request"] = (title, name, balance, portfolio, start_date, end_date)
+
+    request = st.session_state.get("portfolio_request")
+    if request is None:
+        return
+    title, name, balance, portfolio, start_date, end_date = request
+    if real:
+        # Stops the page with a message if CPI.txt is missing, before the job needs it.
+        load_data_from_local(CPI_PATH)
+    # Toggling `real` starts a new simulation job, but the prices come from the shared store.
+    job = jobs.submit(("portfolio", tuple(portfolio.items()), balance, start_date, end_date, real),
+                      simulate_portfolio, portfolio, balance, start_date, end_date, real)
+    if not jobs.show_job(job, f"Simulating portfolio of {', '.join(portfolio)}..."):
+        return
+    # Warning message for empty data
+    if job.result is None:
+        st.error("⚠️ No data retrieved. Try adjusting the tickers or date range.")
+        return
+    display_results(title, name, job.result)
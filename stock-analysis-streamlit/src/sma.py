@@ -1,12 +1,23 @@
 from __future__ import annotations
 
 import re
+import warnings
 import numpy as np
 import pandas as pd
 import streamlit as st
-import yfinance as yf
 import plotly.express as px
 
+from us_inflation import coverage_note, real_factors
+from utils import jobs
+from utils.adjust import apply_factors
+from utils.backtest import sweep_tickers
+from utils.history import history_view, raw_history
+from utils.providers import period_start
+from utils.shared_store import SharedFrame, share_array
+
+# Periods offered by the SMA pages, shortest first.
+PERIODS = ["20d", "1mo", "3mo", "6mo", "1y", "3y", "5y"]
+
 # ----------------------------
 # Core SMA Function using sliding window approach.
 # Returns array same length as `values`, with NaN for the first window-1 entries
@@ -46,6 +57,52 @@ def sma_sliding(values: np.ndarray, window: int) -> np.ndarray:
 
     return out
 
+# ----------------------------
+# SMA crossover strategy built on sma_sliding.
+# Long while SMA(short) > SMA(long), flat otherwise. A golden cross is the short SMA moving
+# above the long one, a death cross moving below. The position decided at the close of bar i
+# earns the return from bar i to i+1 (no look-ahead); `cost` is charged on each position change.
+# ----------------------------
+def crossover_signals(close: np.ndarray, short: int, long: int):
+    if short >= long:
+        raise ValueError("Short window must be smaller than the long window.")
+    sma_short = sma_sliding(close, short)
+    sma_long = sma_sliding(close, long)
+    # NaN comparisons are False, so the warm-up period counts as flat.
+    position = sma_short > sma_long
+    prev = np.concatenate(([False], position[:-1]))
+    # Only count a cross when both averages existed on the previous bar too.
+    valid_prev = np.concatenate(([False], np.isfinite(sma_long[:-1])))
+    golden = position & ~prev & valid_prev
+    death = ~position & prev & valid_prev
+    return sma_short, sma_long, position, golden, death
+
+# Backtest one (short, long) pair. Returns the signals, the strategy equity curve (starting at 1)
+# and summary figures; utils.backtest.sweep_crossover computes the same total return for a grid.
+def backtest_crossover(close: np.ndarray, short: int, long: int, cost: float = 0.0) -> dict:
+    close = np.asarray(close, dtype=np.float64)
+    if (close <= 0).any():
+        raise ValueError("Close prices must be positive to backtest.")
+    sma_short, sma_long, position, golden, death = crossover_signals(close, short, long)
+    log_ret = np.diff(np.log(close))
+    strat = position[:-1] * log_ret
+    trades = np.diff(position.astype(np.int8), prepend=0) != 0
+    if cost:
+        strat = strat + trades[:-1] * np.log1p(-cost)
+    equity = np.exp(np.concatenate(([0.0], np.cumsum(strat))))
+    return {
+        "sma_short": sma_short,
+        "sma_long": sma_long,
+        "position": position,
+        "golden": golden,
+        "death": death,
+        "equity": equity,
+        "total_return": float(equity[-1] - 1.0),
+        "buy_hold_return": float(close[-1] / close[0] - 1.0),
+        "trades": int(np.count_nonzero(trades[:-1])),
+        "exposure": float(position[:-1].mean()) if close.size > 1 else 0.0,
+    }
+
 # ----------------------------
 # Helper functions
 # ----------------------------
@@ -110,54 +167,112 @@ def get_close_1d(df: pd.DataFrame) -> np.ndarray:
         raise ValueError(f"Expected a single series, got shape {arr.shape}")
     return arr
 
+# Clean index: drop dupes, sort. Returns the frame untouched (no copy) when already clean.
+def _clean_index(df: pd.DataFrame) -> pd.DataFrame:
+    if df.index.has_duplicates or not df.index.is_monotonic_increasing:
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+    return df
+
+# The last `period` of a shared ticker history (see utils/history.py), adjusted for dividends
+# or not. Neither the period nor the adjustment needs a new download.
+def period_view(handle: SharedFrame, period: str, auto_adjust: bool) -> pd.DataFrame:
+    start = period_start(period, pd.Timestamp.today().normalize() + pd.Timedelta(days=1))
+    return history_view(handle, auto_adjust, start=start)
+
+# Background job wrapper around raw_history. Runs off the script thread, so no st.* calls here.
+def fetch_history(job: jobs.Job, ticker: str) -> SharedFrame:
+    job.report(0, 1, "(history)")
+    return raw_history(ticker)
+
+# Clean 1-D close series for one ticker, with leading missing values (IPO, gaps) trimmed.
+# Returns (normalized frame, first valid row, trimmed closes); raises ValueError with a user message.
+def prepared_close(df: pd.DataFrame, ticker: str):
+    if df is None or df.empty:
+        raise ValueError(f"No data returned for {ticker} — check the ticker or period.")
+    df = _normalize_yf_df(_clean_index(df), ticker)
+    close = get_close_1d(df)
+    finite_mask = np.isfinite(close)
+    if not finite_mask.any():
+        raise ValueError(f"All Close values for {ticker} are NaN/Inf.")
+    start = int(np.argmax(finite_mask))
+    close_trim = close[start:]
+    # Interior gaps: carry the last close forward (no trading on a missing bar).
+    if not np.isfinite(close_trim).all():
+        close_trim = pd.Series(close_trim).ffill().to_numpy()
+    return df, start, close_trim
+
 # ----------------------------
 # Public entry point used by your main app
 # ----------------------------
 def show_sma():
     st.header("📈 Simple Moving Average")
 
+    mode = st.radio("Mode", ["Single SMA", "Crossover backtest", "Parameter sweep"], horizontal=True)
+    if mode == "Crossover backtest":
+        show_crossover()
+    elif mode == "Parameter sweep":
+        show_sweep()
+    else:
+        show_single_sma()
+
+def show_single_sma():
     # Getting user input from form.
     with st.form("sma_form"):
         col1, col2, col3, col4 = st.columns([1.2, 1, 1, 1])
         with col1:
             ticker_in = st.text_input("Ticker", value="AAPL", help="e.g., AAPL, MSFT, TSLA, ^GSPC")
         with col2:
-            period = st.selectbox("Period", ["20d", "1mo", "3mo", "6mo", "1y", "3y", "5y"], index=0)
+            period = st.selectbox("Period", PERIODS, index=0)
         with col3:
             window = st.number_input("SMA window", min_value=2, max_value=252, value=5, step=1)
         with col4:
             auto_adjust = st.checkbox("Auto-adjust", value=True, help="Adjust OHLC for splits/dividends")
         submitted = st.form_submit_button("Fetch & Plot")
-
-    if not submitted:
+    # Outside the form: a view option applied on every rerun, never a new download.
+    real = st.checkbox("Inflation-adjusted (real) prices",
+                       help="Deflate prices by the monthly CPI in CPI.txt, in dollars of the period's first day")
+
+    # Remember the submitted request so later reruns (any widget change) keep showing it.
+    if submitted:
+        # Call function to sanitise ticker input.
+        try:
+            ticker = parse_single_ticker(ticker_in)
+        except Exception as e:
+            st.error(str(e))
+            return
+        st.session_state["sma_request"] = (ticker, period, int(window), auto_adjust)
+
+    request = st.session_state.get("sma_request")
+    if request is None:
         st.info("Enter settings and click **Fetch & Plot**.")
         return
+    ticker, period, window, auto_adjust = request
 
-    # Call function to sanitise ticker input.
-    try:
-        ticker = parse_single_ticker(ticker_in)
-    except Exception as e:
-        st.error(str(e))
-        return
-
-    # Download Data using Yfinance API
-    try:
-        df = yf.download(
-            ticker,
-            period=period,
-            interval="1d",
-            auto_adjust=auto_adjust,
-            progress=False,
-        )
-    except Exception as e:
-        st.error(f"Download error: {e}")
+    # Download the ticker's history in the background. Only the ticker is part of the job key,
+    # so changing the period, the SMA window or Auto-adjust reuses the download.
+    job = jobs.submit(("history", ticker), fetch_history, ticker)
+    if not jobs.show_job(job, f"Downloading {ticker}"):
         return
+    df = period_view(job.result, period, auto_adjust)
+    # The rows the period resolved to today. The period label alone is not enough: the session's
+    # history job outlives midnight, while the window it cuts moves with the date.
+    rows = (df.index[0], df.index[-1], len(df)) if not df.empty else None
+    # Which CPI file version the prices were deflated with; None for nominal prices.
+    real_key = None
+    if real and not df.empty:
+        # One multiply of the OHLC columns by the cached per-bar CPI deflator.
+        factors, real_key = real_factors((job.result.key, rows), df.index)
+        df = apply_factors(df, factors)
+        st.caption(f"Real prices, in dollars of {df.index[0]:%d %b %Y}.")
+        note = coverage_note(df.index)
+        if note:
+            st.caption(note)
 
     if df is None or df.empty:
         st.warning("No data returned — check the ticker or period.")
         return
     # Clean index: drop dupes, sort
-    df = df[~df.index.duplicated(keep="last")].sort_index()
+    df = _clean_index(df)
     # Normalize columns to avoid MultiIndex selection errors
     try:
         df = _normalize_yf_df(df, ticker)
@@ -190,8 +305,9 @@ def show_sma():
         st.warning("Not enough valid closes to compute SMA after trimming missing values.")
         return
 
-    # Compute SMA on trimmed series and align back
-    sma_vals = sma_sliding(close_trim, window)
+    # Compute SMA on trimmed series and align back. The SMA is shared too: it only depends
+    # on the shared history, the rows cut from it, the CPI version they were deflated with and the window.
+    sma_vals = share_array((job.result.key, "sma", rows, auto_adjust, real_key, window), lambda: sma_sliding(close_trim, window))
     sma_col = f"SMA_{window}"
     df[sma_col] = np.nan
     df.loc[df.index[start]:, sma_col] = sma_vals
@@ -241,3 +357,189 @@ def show_sma():
         delta=(f"Close - SMA: {latest_close - latest_sma:,.4f}" if np.isfinite(latest_sma) else None),
     )
 
+# ----------------------------
+# Crossover backtest: one (short, long) pair on one ticker
+# ----------------------------
+def show_crossover():
+    with st.form("crossover_form"):
+        col1, col2, col3, col4, col5 = st.columns([1.2, 1, 1, 1, 1])
+        with col1:
+            ticker_in = st.text_input("Ticker", value="AAPL", help="e.g., AAPL, MSFT, TSLA, ^GSPC")
+        with col2:
+            period = st.selectbox("Period", ["6mo", "1y", "3y", "5y"], index=1)
+        with col3:
+            short = st.number_input("Short SMA", min_value=2, max_value=250, value=20, step=1)
+        with col4:
+            long = st.number_input("Long SMA", min_value=3, max_value=252, value=50, step=1)
+        with col5:
+            cost_pct = st.number_input("Cost per trade (%)", min_value=0.0, max_value=5.0, value=0.0, step=0.05)
+        submitted = st.form_submit_button("Backtest")
+
+    if submitted:
+        try:
+            ticker = parse_single_ticker(ticker_in)
+        except Exception as e:
+            st.error(str(e))
+            return
+        if short >= long:
+            st.error("Short window must be smaller than the long window.")
+            return
+        st.session_state["crossover_request"] = (ticker, period, int(short), int(long), float(cost_pct))
+
+    request = st.session_state.get("crossover_request")
+    if request is None:
+        st.info("Pick two windows and click **Backtest**.")
+        return
+    ticker, period, short, long, cost_pct = request
+
+    # Same job (and shared download) as the single SMA view.
+    job = jobs.submit(("history", ticker), fetch_history, ticker)
+    if not jobs.show_job(job, f"Downloading {ticker}"):
+        return
+    try:
+        df, start, close = prepared_close(period_view(job.result, period, True), ticker)
+    except ValueError as e:
+        st.warning(str(e))
+        return
+    if close.size <= long:
+        st.warning(f"Not enough closes ({close.size}) for a {long}-bar SMA; choose a longer period.")
+        return
+
+    bt = backtest_crossover(close, short, long, cost_pct / 100)
+    dates = df.index[start:]
+
+    fig = px.line(
+        pd.DataFrame({"Close": close, f"SMA_{short}": bt["sma_short"], f"SMA_{long}": bt["sma_long"]}, index=dates),
+        color_discrete_map={"Close": "#1f77b4", f"SMA_{short}": "#ff7f0e", f"SMA_{long}": "#9467bd"},
+    )
+    fig.add_scatter(x=dates[bt["golden"]], y=close[bt["golden"]], mode="markers", name="Golden cross",
+                    marker=dict(symbol="triangle-up", size=12, color="green"))
+    fig.add_scatter(x=dates[bt["death"]], y=close[bt["death"]], mode="markers", name="Death cross",
+                    marker=dict(symbol="triangle-down", size=12, color="red"))
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Equity curve (start = 1.0)")
+    st.line_chart(pd.DataFrame({"Strategy": bt["equity"], "Buy & hold": close / close[0]}, index=dates),
+                  use_container_width=True)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Strategy return", f"{bt['total_return']:.2%}",
+                delta=f"{bt['total_return'] - bt['buy_hold_return']:+.2%} vs buy & hold")
+    col2.metric("Buy & hold return", f"{bt['buy_hold_return']:.2%}")
+    col3.metric("Trades", bt["trades"])
+    col4.metric("Time in market", f"{bt['exposure']:.0%}")
+
+# ----------------------------
+# Parameter sweep: every (short, long) pair over several tickers
+# ----------------------------
+
+# Background job: fetch every ticker (resumable), then sweep the grid in a process pool.
+def run_sweep(job: jobs.Job, tickers: list, period: str, short_windows: list, long_windows: list, cost: float) -> dict:
+    histories = jobs.run_items(job, tickers, raw_history, "Downloading")
+    closes, skipped = {}, {}
+    for ticker, handle in histories.items():
+        try:
+            _, _, closes[ticker] = prepared_close(period_view(handle, period, True), ticker)
+        except ValueError as e:
+            skipped[ticker] = str(e)
+    job.report(len(tickers), len(tickers), f"Sweeping {len(short_windows) * len(long_windows)} window pairs")
+    grids = sweep_tickers(closes, short_windows, long_windows, cost)
+    buy_hold = {t: float(c[-1] / c[0] - 1.0) for t, c in closes.items()}
+    return {"grids": grids, "buy_hold": buy_hold, "skipped": skipped}
+
+def _heatmap(grid: np.ndarray, short_windows: list, long_windows: list, title: str):
+    fig = px.imshow(
+        grid * 100,
+        x=[str(w) for w in long_windows],
+        y=[str(w) for w in short_windows],
+        labels=dict(x="Long SMA", y="Short SMA", color="Return (%)"),
+        color_continuous_scale="RdYlGn",
+        color_continuous_midpoint=0.0,
+        origin="lower",
+        aspect="auto",
+        title=title,
+    )
+    return fig
+
+def show_sweep():
+    with st.form("sweep_form"):
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            tickers_in = st.text_input("Tickers", value="AAPL, MSFT, AMZN", help="Comma-separated")
+        with col2:
+            period = st.selectbox("Period", ["1y", "3y", "5y"], index=1)
+        with col3:
+            cost_pct = st.number_input("Cost per trade (%)", min_value=0.0, max_value=5.0, value=0.0, step=0.05)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            short_range = st.slider("Short SMA range", 2, 100, (5, 50))
+        with col2:
+            short_step = st.number_input("Short step", min_value=1, max_value=50, value=5)
+        with col3:
+            long_range = st.slider("Long SMA range", 10, 250, (50, 200))
+        with col4:
+            long_step = st.number_input("Long step", min_value=1, max_value=50, value=10)
+        submitted = st.form_submit_button("Run sweep")
+
+    if submitted:
+        tickers = []
+        for raw in re.split(r"[, \t]+", tickers_in or ""):
+            if not raw:
+                continue
+            t = raw.upper()
+            if not re.fullmatch(r"[A-Z\.\-\^]+", t):
+                st.error(f"Ticker {raw!r} contains invalid characters.")
+                return
+            if t not in tickers:
+                tickers.append(t)
+        if not tickers:
+            st.error("Please enter at least one ticker symbol.")
+            return
+        short_windows = list(range(short_range[0], short_range[1] + 1, int(short_step)))
+        long_windows = list(range(long_range[0], long_range[1] + 1, int(long_step)))
+        st.session_state["sweep_request"] = (tuple(tickers), period, tuple(short_windows), tuple(long_windows),
+                                             float(cost_pct))
+
+    request = st.session_state.get("sweep_request")
+    if request is None:
+        st.info("Choose tickers and window ranges, then click **Run sweep**.")
+        return
+    tickers, period, short_windows, long_windows, cost_pct = request
+
+    job = jobs.submit(("sma-sweep",) + request, run_sweep, list(tickers), period, list(short_windows),
+                      list(long_windows), cost_pct / 100)
+    if not jobs.show_job(job, "Sweeping"):
+        return
+    result = job.result
+    for ticker, reason in result["skipped"].items():
+        st.warning(f"Skipped {ticker}: {reason}")
+    grids = result["grids"]
+    if not grids:
+        return
+
+    # Best pair per ticker, against buy & hold.
+    rows = []
+    for ticker, grid in grids.items():
+        if np.isnan(grid).all():
+            rows.append({"Ticker": ticker, "Short": None, "Long": None, "Best return": np.nan,
+                         "Buy & hold": result["buy_hold"][ticker]})
+            continue
+        i, j = np.unravel_index(np.nanargmax(grid), grid.shape)
+        rows.append({"Ticker": ticker, "Short": short_windows[i], "Long": long_windows[j],
+                     "Best return": grid[i, j], "Buy & hold": result["buy_hold"][ticker]})
+    st.subheader("Best window pair per ticker")
+    st.dataframe(pd.DataFrame(rows).style.format({"Best return": "{:.2%}", "Buy & hold": "{:.2%}"}),
+                 use_container_width=True)
+
+    # Switching the heatmap only reruns the page; the sweep result is reused from the job.
+    choices = (["Average across tickers"] if len(grids) > 1 else []) + list(grids)
+    view = st.selectbox("Heatmap", choices)
+    if view == "Average across tickers":
+        with warnings.catch_warnings():
+            # Pairs that are invalid for every ticker stay NaN.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            grid = np.nanmean(np.stack(list(grids.values())), axis=0)
+    else:
+        grid = grids[view]
+    st.plotly_chart(_heatmap(grid, short_windows, long_windows, f"Total return — {view}"),
+                    use_container_width=True)
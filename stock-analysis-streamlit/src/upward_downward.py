@@ -1,5 +1,4 @@
 import streamlit as st
-import yfinance as yf
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
@@ -7,6 +6,11 @@ import numpy as np
 import datetime
 from pprint import pprint
 
+from utils import jobs
+from utils.history import history_key, history_view, raw_history
+from utils.resample import resampled
+from utils.shared_store import SharedFrame, share_frame
+
 
 def getTrends(key_name:str, stock_symbol:str, df:pd.DataFrame)->dict:
     #df = pd.DataFrame({"price": values}, index=letters)
@@ -14,9 +18,9 @@ def getTrends(key_name:str, stock_symbol:str, df:pd.DataFrame)->dict:
 
     trends = []
     direction = None
-    curr_val = [float(df[key_name,stock_symbol][0])]
+    curr_val = [float(df[key_name,stock_symbol].iloc[0])]
     start_idx = df.index[0]
-    prev_val = float(df[key_name,stock_symbol][0])
+    prev_val = float(df[key_name,stock_symbol].iloc[0])
     prev_idx = df.index[0]
 
     for idx, val in zip(df.index[1:], df[key_name,stock_symbol][1:]):
@@ -83,18 +87,26 @@ def processTrendData(data:list):
 
 
 
-def downloadTicker(ticker:str,start:datetime,end:datetime,interval:str) -> pd.DataFrame:
-    try:
-        ticker_df = yf.download(ticker,
-                                start=start,
-                                end=end,
-                                interval=interval)
-        print(f"Successfully downloaded {ticker}")
-    except ValueError:
+# Adjusted daily bars of `ticker` in [start, end), cut from the ticker's shared history (see
+# utils/history.py) and laid out like yf.download: columns (Price, Ticker).
+def downloadTicker(ticker:str,start:datetime,end:datetime) -> pd.DataFrame:
+    ticker_df = history_view(raw_history(ticker),True,start=start,end=end)
+    if ticker_df.empty:
         print('Ticker Does not exist')
-        print(ValueError)
+        return pd.DataFrame()
+    ticker_df = ticker_df[["Close","High","Low","Open","Volume"]]
+    ticker_df.columns = pd.MultiIndex.from_product([ticker_df.columns,[ticker]],names=["Price","Ticker"])
+    print(f"Successfully downloaded {ticker}")
     return ticker_df
 
+# Background job wrapper around downloadTicker, so the page stays responsive while Yahoo answers.
+# The result lives in the shared store: sessions asking for the same bars share one read-only copy.
+# Only daily bars are kept; weekly/monthly views are resampled locally from them.
+def fetchTicker(job:jobs.Job,ticker:str,start:datetime,end:datetime) -> SharedFrame:
+    job.report(0,1,"(1d)")
+    key = (history_key(ticker),"range",start,end)
+    return share_frame(key,lambda: downloadTicker(ticker,start,end))
+
 def show_trend_analysis():
     st.title("Upward/Downward Stock Analysis")
 
@@ -136,7 +148,16 @@ def show_trend_analysis():
         # Placeholder for analysis logic        
         print(intervals[option])
         print(f"start_date:{start_date}, end_date:{end_date}")        
-        ticker_df = downloadTicker(stock_symbol,start_date,end_date,intervals[option])
+        # Switching the interval doesn't refetch: the job key has no interval, and the
+        # weekly/monthly bars are aggregated from the daily ones (cached per interval).
+        job = jobs.submit(("trend",stock_symbol,start_date,end_date),
+                          fetchTicker,stock_symbol,start_date,end_date)
+        if not jobs.show_job(job,f"Downloading {stock_symbol}"):
+            return
+        if intervals[option] == "1d":
+            ticker_df = job.result.frame()
+        else:
+            ticker_df = resampled(job.result,intervals[option]).frame()
         if ticker_df.empty:
             st.warning(f'Stock: {stock_symbol} does not exist', icon="⚠️")
             return
@@ -193,7 +214,7 @@ def show_trend_analysis():
         for i in range(1,len(ticker_df.index)):
             color = "red"
 
-            if(ticker_df['Close',stock_symbol][i] >= ticker_df['Close',stock_symbol][i-1]):
+            if(ticker_df['Close',stock_symbol].iloc[i] >= ticker_df['Close',stock_symbol].iloc[i-1]):
                 color = "green"
             fig2.add_trace(go.Scatter(
                 x=ticker_df.index[i-1:i+1],
@@ -211,21 +232,28 @@ def show_trend_analysis():
         st.plotly_chart(fig2,use_container_width=True)
 
         print(f'\n\nhighest_up:')
-        pprint(ticker_df.loc[highest_up['start']:highest_up['end']])
+        pprint(ticker_df.loc[highest_up.get('start'):highest_up.get('end')])
         print(f'\n\n{type(ticker_df.index[0])}')
 
             
         st.markdown("<a name='longest-trends-table'></a>", unsafe_allow_html=True)
         st.subheader(":green[Longest Upward Trends]",divider='green')
-        st.dataframe(
-            ticker_df.loc[highest_up['start']:highest_up['end']],
-            use_container_width=True
-        ) 
+        # A short range (e.g. a few monthly bars) may not contain a trend in both directions.
+        if 'start' in highest_up:
+            st.dataframe(
+                ticker_df.loc[highest_up['start']:highest_up['end']],
+                use_container_width=True
+            )
+        else:
+            st.write("No upward trend in this range.")
                 #print(ticker_df['Close','AAPL'].iloc[0:-1])
 
         st.subheader(":red[Longest Downwards Trends]",divider='red')
-        st.dataframe(
-            ticker_df.loc[highest_down['start']:highest_down['end']],
-            use_container_width=True
-        ) 
+        if 'start' in highest_down:
+            st.dataframe(
+                ticker_df.loc[highest_down['start']:highest_down['end']],
+                use_container_width=True
+            )
+        else:
+            st.write("No downward trend in this range.")
        
\ No newline at end of file
@@ -3,31 +3,218 @@ import pandas as pd
 import numpy as np
 import altair as alt
 import os
+import threading
+import zlib
+
+from utils.inflation import cpi_levels, deflator, uncovered
+from utils.shared_store import share_array
 
 SLOPE_TOL = 1e-4
+CPI_PATH = "./CPI.txt"
 
 def parse_mmyy(mmyy: str):
     m = int(mmyy[:2]); y = int(mmyy[2:]); y_full = 2000 + y
     return pd.Timestamp(year=y_full, month=m, day=1)
 
+# Parse one 'MMYY,actual,forecast' line. Returns None for blank or malformed lines.
+def parse_line(raw: str):
+    line = raw.strip()
+    if not line: return None
+    parts = [p.strip() for p in line.split(",")]
+    if len(parts) != 3: return None
+    mmyy, actual, forecast = parts
+    try:
+        dt = parse_mmyy(mmyy)
+        return (dt, float(actual), float(forecast), mmyy, dt.strftime("%b %Y"))
+    except Exception:
+        return None
+
+CPI_COLUMNS = ["date", "actual", "forecast", "mmyy", "month"]
+
+def rows_to_frame(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=CPI_COLUMNS)
+
+# ----------------------------
+# Watched CPI source.
+# The page reruns constantly, but CPI.txt changes about once a month. The parsed frame and
+# everything derived from it are cached per path and only refreshed when (mtime, size) change.
+# CPI.txt lists the newest month first, so a new month is prepended: when the old file is still
+# intact at the end of the new one, only the new head is parsed. Lines appended at the end are
+# handled the same way; any other edit re-parses the whole file.
+# ----------------------------
+class CPISource:
+    def __init__(self, path: str):
+        self.path = path
+        # Reentrant: cards(), chart() and levels() hold it across their call to refresh().
+        self.lock = threading.RLock()
+        self.stat_key = None        # (mtime_ns, size) of the file when last read
+        self.size = 0               # bytes parsed so far (the whole file)
+        self.crc = 0                # crc32 of those bytes, to tell a prepend from a rewrite
+        self.offset = 0             # bytes of complete lines from the start of the file
+        self.prefix_crc = 0         # crc32 of those bytes, to tell an append from a rewrite
+        self.committed = rows_to_frame([])  # rows from complete lines
+        self.pending = None         # row from an unterminated last line, re-read on append
+        self.df = self.committed    # committed + pending, sorted by date
+        self.version = 0
+        self.full_parses = 0
+        self.head_parses = 0
+        self.tail_parses = 0
+        self._cards = None          # (horizons, tail values, cards)
+        self._chart = None          # (version, chart)
+        self._levels = None         # (version, file identity, month starts, compounded levels)
+
+    # Have the bytes we already parsed been left alone, with whole lines added in front of them
+    # (a new month in a newest-first file)? Returns (new head, old bytes), or None.
+    # Checksumming the old bytes is far cheaper than parsing them again.
+    def _prepended(self, f, size: int):
+        if self.stat_key is None or not self.size or size <= self.size:
+            return None
+        f.seek(0)
+        head, old = f.read(size - self.size), f.read()
+        if not head.endswith(b"\n") or zlib.crc32(old) != self.crc:
+            return None
+        return head, old
+
+    # Has the part of the file we already parsed been left alone (i.e. this is an append)?
+    def _prefix_intact(self, f, size: int) -> bool:
+        if self.stat_key is None or size < self.offset:
+            return False
+        f.seek(0)
+        return zlib.crc32(f.read(self.offset)) == self.prefix_crc
+
+    # Add the rows of complete lines in `data`, before or after the committed ones (file order,
+    # so duplicate months resolve the same way as in a full parse).
+    def _add_rows(self, data: bytes, front: bool = False) -> None:
+        new_rows = [r for r in map(parse_line, data.decode("utf-8").splitlines()) if r]
+        if not new_rows:
+            return
+        if not len(self.committed):
+            self.committed = rows_to_frame(new_rows)
+        elif front:
+            self.committed = pd.concat([rows_to_frame(new_rows), self.committed], ignore_index=True)
+        else:
+            self.committed = pd.concat([self.committed, rows_to_frame(new_rows)], ignore_index=True)
+
+    # Parse the new head of a prepended file; the old lines and the pending last line are unchanged.
+    def _parse_head(self, head: bytes, old: bytes) -> None:
+        self._add_rows(head, front=True)
+        self.prefix_crc = zlib.crc32(old[:self.offset], zlib.crc32(head))
+        self.crc = zlib.crc32(old, zlib.crc32(head))
+        self.offset += len(head)
+        self.size += len(head)
+
+    # Parse everything after the complete lines already read (the whole file after a reset).
+    # Only complete lines move the offset; an unterminated last line is re-read next time.
+    def _parse_tail(self, f) -> None:
+        f.seek(self.offset)
+        data = f.read()
+        complete, newline, partial = data.rpartition(b"\n")
+        consumed = len(complete) + len(newline)
+        self._add_rows(complete)
+        self.crc = zlib.crc32(data, self.prefix_crc)
+        self.size = self.offset + len(data)
+        if consumed:
+            self.prefix_crc = zlib.crc32(data[:consumed], self.prefix_crc)
+            self.offset += consumed
+        self.pending = parse_line(partial.decode("utf-8"))
+
+    # Bring the cached frame up to date with the file. Cheap (one stat) when nothing changed.
+    def refresh(self) -> pd.DataFrame:
+        with self.lock:
+            st_ = os.stat(self.path)
+            stat_key = (st_.st_mtime_ns, st_.st_size)
+            if stat_key == self.stat_key:
+                return self.df
+            with open(self.path, "rb") as f:
+                prepended = self._prepended(f, st_.st_size)
+                if prepended is not None:
+                    self.head_parses += 1
+                    self._parse_head(*prepended)
+                else:
+                    if self._prefix_intact(f, st_.st_size):
+                        self.tail_parses += 1
+                    else:
+                        self.offset, self.prefix_crc = 0, 0
+                        self.committed, self.pending = rows_to_frame([]), None
+                        self.full_parses += 1
+                    self._parse_tail(f)
+            df = self.committed if self.pending is None else \
+                pd.concat([self.committed, rows_to_frame([self.pending])], ignore_index=True)
+            self.df = df.sort_values("date", kind="stable")
+            self.stat_key = stat_key
+            self.version += 1
+            return self.df
+
+    # Trend cards for the latest horizons. Recomputed only when the values they cover change,
+    # so an appended month that doesn't move the latest window (e.g. an older revision) is free.
+    def cards(self, horizons: list) -> list:
+        with self.lock:
+            df = self.refresh()
+            y = df["actual"].values
+            tail = tuple(y[-max(horizons):]) if horizons else ()
+            if self._cards is not None and self._cards[0] == tuple(horizons) and self._cards[1] == tail:
+                return self._cards[2]
+            cards = horizon_cards(y, horizons)
+            self._cards = (tuple(horizons), tail, cards)
+            return cards
+
+    # The Altair chart, rebuilt only when the data changed.
+    def chart(self):
+        with self.lock:
+            df = self.refresh()
+            if self._chart is None or self._chart[0] != self.version:
+                self._chart = (self.version, build_chart(df))
+            return self._chart[1]
+
+    # Month starts and compounded CPI levels (utils/inflation.py), rebuilt only when the data changed.
+    # Returns (identity, months, levels); the identity is the parsed file's (size, crc32), which
+    # names its content in every process, unlike `version`, which counts refreshes in this one.
+    def levels(self):
+        with self.lock:
+            df = self.refresh()
+            if self._levels is None or self._levels[0] != self.version:
+                self._levels = (self.version, (self.size, self.crc), *cpi_levels(df))
+            return self._levels[1:]
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+# One watched source per file, shared by every session in the process.
+def cpi_source(path: str) -> CPISource:
+    key = os.path.abspath(path)
+    with _sources_lock:
+        if key not in _sources:
+            _sources[key] = CPISource(key)
+        return _sources[key]
+
 # Read CPI.txt file that contains data in MMYY,actual,forecast format. Store it in a pandas dataFrame.
+# The frame is cached (see CPISource) and shared, so treat it as read-only.
 def load_data_from_local(path: str) -> pd.DataFrame:
     if not os.path.exists(path):
         st.error(f"'{path}' not found. Place your CPI file in the same folder and name it 'CPI.txt'."); st.stop()
-    rows = []
-    with open(path, "r", encoding="utf-8") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line: continue
-            parts = [p.strip() for p in line.split(",")]
-            if len(parts) != 3: continue
-            mmyy, actual, forecast = parts
-            try:
-                dt = parse_mmyy(mmyy)
-                rows.append((dt, float(actual), float(forecast), mmyy))
-            except Exception:
-                continue
-    return pd.DataFrame(rows, columns=["date", "actual", "forecast", "mmyy"]).sort_values("date")
+    return cpi_source(path).refresh()
+
+# Per-date factors that turn nominal values on `dates` into real ones (dollars of the first date).
+# `key` names the series (e.g. a shared price history): the as-of join and the factors are computed
+# once per series and CPI file content, and shared by every session (and, with a store directory,
+# every process). Also returns that key, for caching anything derived from the real values:
+# editing CPI.txt changes it.
+def real_factors(key, dates, path: str = CPI_PATH) -> tuple[np.ndarray, tuple]:
+    load_data_from_local(path)
+    source = cpi_source(path)
+    identity, months, levels = source.levels()
+    real_key = (key, "real", source.path, identity)
+    return share_array(real_key, lambda: deflator(dates, months, levels)), real_key
+
+# A caption warning when part of `dates` lies outside the months in CPI.txt, else None.
+def coverage_note(dates, path: str = CPI_PATH):
+    _, months, _ = cpi_source(path).levels()
+    share = uncovered(dates, months)
+    if not share or not len(months):
+        return None
+    first, last = pd.Timestamp(months[0]), pd.Timestamp(months[-1])
+    return (f"CPI.txt covers {first:%b %Y} – {last:%b %Y}; {share:.0%} of these dates fall outside it "
+            f"and use the nearest month's CPI level.")
 
 # This is the core function that computes the linear trend (slope) of the CPI data agains the time.
 def slope_ols(y: np.ndarray) -> float:
@@ -46,22 +233,9 @@ def classify_trend(slope: float, tol: float) -> str:
     if slope < -tol: return "Downtrend"
     return "Stable"
 
-# This is the main function that is called when user clicks on "Inflation analyzer"
-def main():
-    st.set_page_config(page_title="US Macro Analysis", page_icon="📊", layout="wide")
-    st.title("US Inflationary Analyser")
-
-    df = load_data_from_local("./CPI.txt")
-    if df.empty:
-        st.warning("No valid rows parsed from CPI.txt. Ensure each line is 'MMYY,actual,forecast'."); st.stop()
-
-    df["month"] = df["date"].dt.strftime("%b %Y")
-    y = df["actual"].values
-
-    horizons = [3, 6, 12]
+# Calculates the slope for the latest h months. Also does checks to ensure data input is valid.
+def horizon_cards(y: np.ndarray, horizons: list) -> list:
     cards = []
-
-    # Calculates the slope for the latest h months. Also does checks to ensure data input is valid.
     for h in horizons:
         if len(y) >= 2:
             h_use = min(h, len(y))
@@ -70,19 +244,10 @@ def main():
         else:
             h_use = len(y); slope = np.nan; verdict = "Insufficient data"
         cards.append((h_use, slope, verdict))
+    return cards
 
-    cols = st.columns(len(cards))
-    for col, (h_use, slope, verdict) in zip(cols, cards):
-        if verdict == "Uptrend":
-            col.success(f"Last {h_use} months: Uptrend  \nSlope: {slope:+.4f} pp/month")
-        elif verdict == "Downtrend":
-            col.error(f"Last {h_use} months: Downtrend  \nSlope: {slope:+.4f} pp/month")
-        elif verdict == "Stable":
-            col.info(f"Last {h_use} months: Stable  \nSlope: {slope:+.4f} pp/month")
-        else:
-            col.warning(f"Last {h_use} months: Insufficient data")
-
-    # Plotting the bar chart of CPI data over the months with the Forcasted data as orange circles.
+# Plotting the bar chart of CPI data over the months with the Forcasted data as orange circles.
+def build_chart(df: pd.DataFrame):
     base = alt.Chart(df).encode(
         x=alt.X("month:N", sort=list(df["month"]), title="Month"),
         tooltip=[
@@ -97,8 +262,33 @@ def main():
         x=alt.X("month:N", sort=list(df["month"])),
         y=alt.Y("forecast:Q")
     )
-    chart = (bars + dots).properties(height=420)
-    st.altair_chart(chart, use_container_width=True)
+    return (bars + dots).properties(height=420)
+
+# This is the main function that is called when user clicks on "Inflation analyzer"
+def main():
+    st.set_page_config(page_title="US Macro Analysis", page_icon="📊", layout="wide")
+    st.title("US Inflationary Analyser")
+
+    df = load_data_from_local(CPI_PATH)
+    if df.empty:
+        st.warning("No valid rows parsed from CPI.txt. Ensure each line is 'MMYY,actual,forecast'."); st.stop()
+
+    source = cpi_source(CPI_PATH)
+    horizons = [3, 6, 12]
+    cards = source.cards(horizons)
+
+    cols = st.columns(len(cards))
+    for col, (h_use, slope, verdict) in zip(cols, cards):
+        if verdict == "Uptrend":
+            col.success(f"Last {h_use} months: Uptrend  \nSlope: {slope:+.4f} pp/month")
+        elif verdict == "Downtrend":
+            col.error(f"Last {h_use} months: Downtrend  \nSlope: {slope:+.4f} pp/month")
+        elif verdict == "Stable":
+            col.info(f"Last {h_use} months: Stable  \nSlope: {slope:+.4f} pp/month")
+        else:
+            col.warning(f"Last {h_use} months: Insufficient data")
+
+    st.altair_chart(source.chart(), use_container_width=True)
 
 if __name__ == "__main__":
     main()
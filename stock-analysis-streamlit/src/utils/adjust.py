@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Corporate-action adjustment.
+# Histories are stored unadjusted, as Yahoo's Ticker.history(auto_adjust=False) returns them
+# (prices already split-adjusted, dividends in their own column). The adjusted view is one
+# vectorised multiply of the OHLC columns by a per-bar cumulative dividend factor: the same
+# numbers yfinance's auto_adjust=True produces, without downloading the history again.
+# ----------------------------
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+
+# Per-bar factor that turns unadjusted prices into dividend-adjusted ones.
+# A dividend D going ex on bar i scales every earlier bar by (1 - D / close[i-1]); the factor of
+# a bar is the product over all later ex-dates, i.e. a reversed cumulative product.
+def dividend_factors(close, dividends) -> np.ndarray:
+    close = pd.Series(np.asarray(close, dtype=np.float64)).ffill().to_numpy()
+    dividends = np.nan_to_num(np.asarray(dividends, dtype=np.float64))
+    step = np.ones(close.shape[0])
+    ex = np.flatnonzero(dividends[1:] > 0) + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = 1.0 - dividends[ex] / close[ex - 1]
+    # A dividend with no usable close before it (or larger than the close) is ignored.
+    ratio = np.where(np.isfinite(ratio) & (ratio > 0), ratio, 1.0)
+    step[ex - 1] = ratio
+    return np.cumprod(step[::-1])[::-1]
+
+
+# Prices of `df` multiplied by `factors` (one per row); other columns are kept as they are.
+def apply_factors(df: pd.DataFrame, factors: np.ndarray) -> pd.DataFrame:
+    cols = [c for c in PRICE_COLUMNS if c in df.columns]
+    out = df.copy()
+    out[cols] = df[cols].to_numpy() * np.asarray(factors)[:, None]
+    return out
+
+
+# Dividend-adjusted copy of an unadjusted history with Close and Dividends columns.
+def adjust_history(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty or "Dividends" not in df.columns:
+        return df
+    return apply_factors(df, dividend_factors(df["Close"], df["Dividends"]))
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# ----------------------------
+# Vectorised SMA-crossover parameter sweep.
+# Kept free of Streamlit/plotly imports so process-pool workers start quickly.
+#
+# Strategy (same as sma.backtest_crossover): long one unit while SMA(short) > SMA(long), flat
+# otherwise. The position decided at the close of bar i earns the return from bar i to i+1,
+# so there is no look-ahead. `cost` is a proportional cost charged on every position change.
+# ----------------------------
+
+# Cap on (window pairs x bars) evaluated at once, to bound memory on long histories.
+MAX_CELLS = 4_000_000
+
+
+# SMA of `values` for each window, as a (len(windows), n) array with NaN warm-up entries.
+# Prefix sums make every window O(n) without a Python-level loop over bars.
+def sma_matrix(values: np.ndarray, windows) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[0]
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    out = np.full((len(windows), n), np.nan)
+    for k, w in enumerate(windows):
+        if w <= 0:
+            raise ValueError("window must be positive")
+        if w <= n:
+            out[k, w - 1:] = (csum[w:] - csum[:-w]) / w
+    return out
+
+
+def _validate_close(close: np.ndarray) -> np.ndarray:
+    close = np.asarray(close, dtype=np.float64)
+    if close.ndim != 1:
+        raise ValueError(f"Expected a single series (1-D), got shape {close.shape}")
+    if not np.isfinite(close).all() or (close <= 0).any():
+        raise ValueError("Close prices must be finite and positive. Clean your data before backtesting.")
+    return close
+
+
+# Total strategy return for every (short, long) pair: grid[i, j] is the return of
+# (short_windows[i], long_windows[j]); NaN where short >= long or long exceeds the history.
+def sweep_crossover(close: np.ndarray, short_windows, long_windows, cost: float = 0.0,
+                    max_cells: int = MAX_CELLS) -> np.ndarray:
+    close = _validate_close(close)
+    short_windows = [int(w) for w in short_windows]
+    long_windows = [int(w) for w in long_windows]
+    n = close.shape[0]
+    grid = np.full((len(short_windows), len(long_windows)), np.nan)
+    pairs = [(i, j) for i, s in enumerate(short_windows) for j, l in enumerate(long_windows) if s < l <= n]
+    if not pairs or n < 2:
+        return grid
+
+    windows = sorted(set(short_windows) | set(long_windows))
+    row = {w: k for k, w in enumerate(windows)}
+    smas = sma_matrix(close, windows)[:, :-1]  # the last bar's signal has no next return
+    log_ret = np.diff(np.log(close))
+    cost_log = np.log1p(-cost) if cost else 0.0
+
+    chunk = max(1, max_cells // n)
+    for start in range(0, len(pairs), chunk):
+        ii, jj = map(np.array, zip(*pairs[start:start + chunk]))
+        short_rows = [row[short_windows[i]] for i in ii]
+        long_rows = [row[long_windows[j]] for j in jj]
+        # NaN comparisons are False, so the warm-up period is flat.
+        pos = smas[short_rows] > smas[long_rows]
+        total = pos.astype(np.float64) @ log_ret
+        if cost:
+            trades = np.count_nonzero(np.diff(pos, axis=1, prepend=False), axis=1)
+            total += trades * cost_log
+        grid[ii, jj] = np.expm1(total)
+    return grid
+
+
+def _sweep_task(args) -> np.ndarray:
+    close, short_windows, long_windows, cost = args
+    return sweep_crossover(close, short_windows, long_windows, cost)
+
+
+# Sweep every ticker: vectorised within a ticker, one ticker per worker process across tickers.
+# `closes` maps ticker -> clean 1-D close array. Returns ticker -> grid.
+def sweep_tickers(closes: dict, short_windows, long_windows, cost: float = 0.0,
+                  max_workers: int | None = None) -> dict:
+    tickers = list(closes)
+    workers = min(len(tickers), max_workers or os.cpu_count() or 1)
+    tasks = [(closes[t], list(short_windows), list(long_windows), cost) for t in tickers]
+    if workers <= 1:
+        return {t: _sweep_task(task) for t, task in zip(tickers, tasks)}
+    # "spawn": the Streamlit server is multi-threaded, and forking a threaded process is unsafe.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        return dict(zip(tickers, pool.map(_sweep_task, tasks)))
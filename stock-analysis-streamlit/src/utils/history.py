@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from utils.adjust import apply_factors, dividend_factors
+from utils.providers import get_provider
+from utils.shared_store import SharedFrame, share_array, share_frame
+
+# ----------------------------
+# One cached price history per ticker.
+# Pages ask here instead of downloading their own window. The ticker's full daily history is
+# fetched once a day, unadjusted and with its dividends and splits, into the shared store. Each
+# page cuts its date range out of it and picks the adjusted or unadjusted view locally, so
+# toggling Auto-adjust or moving the dates never goes back to the network.
+# ----------------------------
+
+HISTORY_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+
+# The provider's full daily history for `ticker`: unadjusted, tz-naive dates (like yf.download),
+# always with HISTORY_COLUMNS. Unknown tickers come back as an empty frame.
+def download_history(ticker: str) -> pd.DataFrame:
+    df = get_provider().history(ticker, period="max", interval="1d", auto_adjust=False, actions=True)
+    if df.empty:
+        return pd.DataFrame(columns=HISTORY_COLUMNS, dtype="float64", index=pd.DatetimeIndex([], name="Date"))
+    df = df.reindex(columns=HISTORY_COLUMNS)
+    df[["Dividends", "Stock Splits"]] = df[["Dividends", "Stock Splits"]].fillna(0.0)
+    if df.index.tz is not None:
+        # Daily bars: keep the exchange-local date.
+        df.index = df.index.tz_localize(None)
+    df.index.name = "Date"
+    if df.index.has_duplicates or not df.index.is_monotonic_increasing:
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+    return df
+
+
+def history_key(ticker: str) -> tuple:
+    # The day is part of the key: today's history has one more bar than yesterday's.
+    return (get_provider().name, "history", ticker.upper(), pd.Timestamp.today().date())
+
+
+# The shared, unadjusted history of `ticker`; only the first caller of the day downloads it.
+def raw_history(ticker: str) -> SharedFrame:
+    return share_frame(history_key(ticker), lambda: download_history(ticker))
+
+
+# Per-bar dividend adjustment factors of a shared history, computed once and shared too.
+def adjustment_factors(raw: SharedFrame) -> np.ndarray:
+    def build():
+        df = raw.frame()
+        return dividend_factors(df["Close"], df["Dividends"])
+    return share_array((raw.key, "dividend factors"), build)
+
+
+# Rows of `df` with start <= date < end (either bound optional), as a zero-copy slice.
+def date_range(df: pd.DataFrame, start=None, end=None) -> slice:
+    lo = df.index.searchsorted(pd.Timestamp(start)) if start is not None else 0
+    hi = df.index.searchsorted(pd.Timestamp(end)) if end is not None else len(df)
+    return slice(lo, hi)
+
+
+# The [start, end) window of an unadjusted history, dividend-adjusted when `auto_adjust`
+# (by the factors computed over the whole history, as Yahoo's adjusted closes are).
+def select(df: pd.DataFrame, factors: np.ndarray | None, auto_adjust: bool = True, start=None, end=None) -> pd.DataFrame:
+    rows = date_range(df, start, end)
+    window = df.iloc[rows]
+    if auto_adjust and factors is not None:
+        window = apply_factors(window, factors[rows])
+    return window
+
+
+# The view of a shared history a page works on: only the requested window, adjusted on demand.
+def history_view(raw: SharedFrame, auto_adjust: bool = True, start=None, end=None) -> pd.DataFrame:
+    return select(raw.frame(), adjustment_factors(raw) if auto_adjust else None, auto_adjust, start, end)
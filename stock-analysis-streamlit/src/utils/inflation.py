@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# CPI deflation of daily series.
+# CPI.txt holds monthly CPI changes (percent, month over month). Compounding them gives a CPI
+# level per month; each daily timestamp is joined to the latest month that started on or before
+# it (an as-of join done with one searchsorted), and nominal values are divided by that level.
+# Real values are expressed in dollars of the series' first date.
+# ----------------------------
+
+
+def _as_ns(dates) -> np.ndarray:
+    dates = pd.DatetimeIndex(dates)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return dates.as_unit("ns").to_numpy()
+
+
+# Month start dates (datetime64[ns]) and compounded CPI levels from a CPI frame with `date` and
+# `actual` (percent change) columns. levels[0] = 1.0 stands for "before the first month", so
+# levels[k] is the level at the end of month k-1.
+def cpi_levels(cpi: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    cpi = cpi.drop_duplicates("date", keep="last").sort_values("date")
+    months = _as_ns(cpi["date"])
+    levels = np.concatenate(([1.0], np.cumprod(1.0 + cpi["actual"].to_numpy(dtype=np.float64) / 100.0)))
+    return months, levels
+
+
+# For each date, the position in `levels` of its CPI month: 0 before the first month, and the
+# last month's level is carried forward past the end of the file.
+def asof_index(dates, months: np.ndarray) -> np.ndarray:
+    return np.searchsorted(months, _as_ns(dates), side="right")
+
+
+# Per-date factors turning nominal values into real ones, in dollars of the first date:
+# real = nominal * factor, with factor[0] == 1.
+def deflator(dates, months: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    level = levels[asof_index(dates, months)]
+    if level.size == 0:
+        return level
+    return level[0] / level
+
+
+# Share of `dates` outside the months CPI covers (their CPI level is held flat).
+def uncovered(dates, months: np.ndarray) -> float:
+    ns = _as_ns(dates)
+    if ns.size == 0:
+        return 0.0
+    if months.size == 0:
+        return 1.0
+    end = (pd.Timestamp(months[-1]) + pd.offsets.MonthBegin(1)).as_unit("ns").to_datetime64()
+    return float(((ns < months[0]) | (ns >= end)).mean())
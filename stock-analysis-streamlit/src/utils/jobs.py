@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable
+
+import streamlit as st
+
+# ----------------------------
+# Background job runner.
+# Long downloads and simulations run in worker threads so a slow Yahoo response never
+# blocks the page, and a widget change (which reruns the script) never throws the work away.
+# Jobs live in st.session_state, keyed by the inputs that define the work, so a finished
+# result is reused for as long as those inputs stay the same.
+# ----------------------------
+
+# Threads rather than processes: the jobs spend most of their time waiting on the network,
+# so the pool is sized for many sessions' downloads in flight at once, not for the CPU count.
+MAX_WORKERS = 32
+# How many of one session's jobs may run at once; the rest wait their turn in that session, so
+# one user (or a few slow Yahoo calls) can't hold every worker while other sessions queue.
+MAX_SESSION_RUNNING = 2
+# How many finished jobs a single session keeps around before the oldest are dropped.
+MAX_SESSION_JOBS = 16
+# How often (seconds) the progress bar polls a running job.
+POLL_INTERVAL = 0.5
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="job")
+_SESSION_KEY = "_jobs"
+_SLOTS_KEY = "_job_slots"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    # `fn` is called as fn(job, *args, **kwargs) on a worker thread. It must not call any
+    # st.* function; it reports progress through job.report() and may keep partial results
+    # in job.checkpoint so a cancelled job can resume where it stopped.
+    def __init__(self, key: Hashable, fn: Callable[..., Any], args: tuple = (), kwargs: dict | None = None):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.status = "pending"  # pending -> running -> done | error | cancelled
+        self.progress = 0.0
+        self.message = ""
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.checkpoint: dict = {}
+        self.queued_at: float | None = None
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        # The session's share of the pool (see submit()); None submits straight to the pool.
+        self.slots: _Slots | None = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.status in ("pending", "running")
+
+    @property
+    def done(self) -> bool:
+        return self.status == "done"
+
+    # Submit (or resubmit, after a cancel or error) the job to the worker pool. It stays
+    # "pending" until a worker actually picks it up.
+    def start(self) -> None:
+        with self._lock:
+            if self.running and self.queued_at is not None:
+                return
+            self._cancel.clear()
+            self.status = "pending"
+            self.error = None
+            self.queued_at = time.monotonic()
+            self.started_at = None
+            self.finished_at = None
+        if self.slots is not None:
+            self.slots.submit(self)
+        else:
+            _executor.submit(self._run)
+
+    def _run(self) -> None:
+        try:
+            with self._lock:
+                if self._cancel.is_set():
+                    raise JobCancelled()
+                self.status = "running"
+                self.started_at = time.monotonic()
+            result = self.fn(self, *self.args, **self.kwargs)
+        except JobCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = e
+            self.status = "error"
+        else:
+            self.result = result
+            self.progress = 1.0
+            self.status = "done"
+            # Partial results are only needed to resume; don't keep a second copy alive.
+            self.checkpoint.clear()
+        finally:
+            self.finished_at = time.monotonic()
+            if self.slots is not None:
+                self.slots.finished()
+
+    # Ask the job to stop. Cancellation is cooperative: it takes effect at the next
+    # report()/check_cancelled() call, so a single in-flight download still completes.
+    # A job still waiting for its session's turn is cancelled on the spot.
+    def cancel(self) -> None:
+        self._cancel.set()
+        if self.slots is not None and self.slots.discard(self):
+            self.status = "cancelled"
+            self.finished_at = time.monotonic()
+
+    def resume(self) -> None:
+        if self.status in ("cancelled", "error"):
+            self.start()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    # Called from inside `fn` to publish progress; doubles as a cancellation point.
+    def report(self, done: int, total: int, message: str = "") -> None:
+        self.progress = min(max(done / total, 0.0), 1.0) if total else 1.0
+        if message:
+            self.message = message
+        self.check_cancelled()
+
+
+# A session's share of the worker pool: at most `limit` of its jobs are in the pool at once,
+# the others wait here in submission order and are handed over as running ones finish.
+class _Slots:
+    def __init__(self, limit: int = MAX_SESSION_RUNNING):
+        self.limit = limit
+        self.active = 0
+        self.waiting: deque[Job] = deque()
+        self._lock = threading.Lock()
+
+    def submit(self, job: Job) -> None:
+        with self._lock:
+            if self.active >= self.limit:
+                self.waiting.append(job)
+                return
+            self.active += 1
+        _executor.submit(job._run)
+
+    # Called by a job when it leaves the pool: pass its slot to the next waiting job.
+    def finished(self) -> None:
+        with self._lock:
+            job = self.waiting.popleft() if self.waiting else None
+            if job is None:
+                self.active -= 1
+                return
+        _executor.submit(job._run)
+
+    # Take a job out of the waiting line; False if it is already in the pool.
+    def discard(self, job: Job) -> bool:
+        with self._lock:
+            try:
+                self.waiting.remove(job)
+            except ValueError:
+                return False
+            return True
+
+
+# Run `fn(item)` for every item, skipping the ones a previous (cancelled) run already finished.
+# Returns {item: result} in the order of `items`.
+def run_items(job: Job, items: Iterable[Hashable], fn: Callable[[Any], Any], label: str = "Processing") -> dict:
+    items = list(items)
+    finished = job.checkpoint.setdefault("items", {})
+    total = len(items)
+    for item in items:
+        if item in finished:
+            continue
+        job.report(len(finished), total, f"{label} {item} ({len(finished) + 1}/{total})")
+        finished[item] = fn(item)
+    job.report(total, total, f"{label} complete")
+    return {item: finished[item] for item in items}
+
+
+# ----------------------------
+# Session helpers used by the pages
+# ----------------------------
+def _session_jobs() -> dict:
+    if _SESSION_KEY not in st.session_state:
+        st.session_state[_SESSION_KEY] = {}
+    return st.session_state[_SESSION_KEY]
+
+
+def _session_slots() -> _Slots:
+    if _SLOTS_KEY not in st.session_state:
+        st.session_state[_SLOTS_KEY] = _Slots()
+    return st.session_state[_SLOTS_KEY]
+
+
+def get_job(key: Hashable) -> Job | None:
+    return _session_jobs().get(key)
+
+
+# Return the session's job for `key`, starting it if it doesn't exist yet.
+# An existing job is returned as-is: a finished one is reused (no refetch), and a cancelled or
+# failed one stays stopped until the user clicks Resume/Retry in show_job().
+def submit(key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Job:
+    jobs = _session_jobs()
+    job = jobs.get(key)
+    if job is None:
+        job = Job(key, fn, args, kwargs)
+        job.slots = _session_slots()
+        jobs[key] = job
+        _evict_finished(jobs)
+        job.start()
+    return job
+
+
+# Keep the session's job table bounded: drop the oldest finished jobs first.
+def _evict_finished(jobs: dict) -> None:
+    excess = len(jobs) - MAX_SESSION_JOBS
+    if excess <= 0:
+        return
+    for key in [k for k, j in jobs.items() if not j.running][:excess]:
+        del jobs[key]
+
+
+def _widget_key(job: Job, name: str) -> str:
+    return f"job-{name}-{abs(hash(job.key))}"
+
+
+# Render the state of a job. Returns True once the result is ready to use.
+# While the job runs, a fragment polls it and reruns the whole page when it finishes.
+def show_job(job: Job, label: str) -> bool:
+    if job.done:
+        return True
+    if job.status == "error":
+        st.error(f"{label} failed: {job.error}")
+        if st.button("Retry", key=_widget_key(job, "retry")):
+            job.resume()
+            st.rerun()
+        return False
+    if job.status == "cancelled":
+        st.warning(f"{label} cancelled at {job.progress:.0%}.")
+        if st.button("Resume", key=_widget_key(job, "resume")):
+            job.resume()
+            st.rerun()
+        return False
+    _job_progress(job, label)
+    return False
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def _job_progress(job: Job, label: str) -> None:
+    if not job.running:
+        # Finished, failed or cancelled since the last poll: redraw the page around it.
+        st.rerun()
+    message = "waiting for a free worker..." if job.status == "pending" else job.message
+    st.progress(job.progress, text=f"{label} {message}".strip())
+    if st.button("Cancel", key=_widget_key(job, "cancel")):
+        job.cancel()
+        job.message = "cancelling..."
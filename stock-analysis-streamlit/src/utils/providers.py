@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+import re
+
+import pandas as pd
+import yfinance as yf
+
+from utils import synthetic
+from utils.adjust import adjust_history
+from utils.resample import resample_ohlcv
+
+# ----------------------------
+# Market data providers.
+# Pages fetch through get_provider() instead of calling yfinance directly, so the same code
+# runs against Yahoo or against deterministic synthetic data (offline runs, load tests).
+# Both providers mirror the yfinance call shapes the pages already rely on:
+#   download(...) -> yf.download frame, columns MultiIndex (Price, Ticker)
+#   history(...)  -> yf.Ticker(t).history frame, single-level columns
+# ----------------------------
+
+# Environment variable that selects the provider when the app starts ("yahoo" or "synthetic").
+PROVIDER_ENV = "STOCK_DATA_PROVIDER"
+SEED_ENV = "STOCK_SYNTHETIC_SEED"
+
+
+class YahooProvider:
+    name = "yahoo"
+
+    def download(self, tickers, **kwargs) -> pd.DataFrame:
+        return yf.download(tickers, **kwargs)
+
+    def history(self, ticker: str, **kwargs) -> pd.DataFrame:
+        return yf.Ticker(ticker).history(**kwargs)
+
+
+class SyntheticProvider:
+    name = "synthetic"
+
+    # as_of pins "today" so period-based requests ("6mo", "5y") are reproducible too.
+    # dividend_yield: annual cash yield, paid quarterly; the bars themselves are unadjusted.
+    def __init__(self, *, volatility: float = 0.02, drift: float = 0.0003, gap_prob: float = 0.0,
+                 ipos: dict | None = None, seed: int = 0, as_of=None, dividend_yield: float = 0.015):
+        self.volatility = volatility
+        self.dividend_yield = dividend_yield
+        self.drift = drift
+        self.gap_prob = gap_prob
+        self.ipos = {t.upper(): pd.Timestamp(d) for t, d in (ipos or {}).items()}
+        self.seed = seed
+        self.as_of = pd.Timestamp(as_of).normalize() if as_of is not None else None
+
+    def _today(self) -> pd.Timestamp:
+        return self.as_of if self.as_of is not None else pd.Timestamp.today().normalize()
+
+    # Resolve yfinance-style start/end/period arguments into a [start, end) window.
+    def _window(self, start, end, period) -> tuple[pd.Timestamp, pd.Timestamp]:
+        end_ts = pd.Timestamp(end) if end is not None else self._today() + pd.Timedelta(days=1)
+        if start is not None:
+            return pd.Timestamp(start), end_ts
+        return period_start(period or "1mo", end_ts), end_ts
+
+    # One ticker's bars in the window. The path is generated from a fixed origin and sliced, so
+    # overlapping requests agree on every bar they share. Weekly and coarser bars are aggregated
+    # from the daily path, so every interval describes the same market.
+    def bars(self, ticker: str, start=None, end=None, period=None, interval: str = "1d") -> pd.DataFrame:
+        if interval in ("1wk", "1mo", "3mo"):
+            start_ts, end_ts = self._window(start, end, period)
+            return resample_ohlcv(self.bars(ticker, start_ts, end_ts, None, "1d"), interval)
+        start_ts, end_ts = self._window(start, end, period)
+        # Unknown symbols come back empty, as they do from Yahoo.
+        if not re.fullmatch(r"[A-Z0-9\.\-\^=]+", ticker.upper()):
+            return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"], dtype="float64",
+                                index=pd.DatetimeIndex([], name="Date"))
+        origin = synthetic.series_origin(interval, self._today())
+        index = synthetic.bar_index(interval, origin, end=max(end_ts, origin))
+        df = synthetic.generate_ohlcv(
+            ticker, index, interval,
+            volatility=self.volatility, drift=self.drift, gap_prob=self.gap_prob,
+            ipo=self.ipos.get(ticker.upper()), seed=self.seed,
+        )
+        df = df[df.index >= start_ts]
+        df.index.name = "Datetime" if interval in synthetic.INTRADAY else "Date"
+        return df
+
+    # Daily bars with the ticker's Dividends and Stock Splits (no splits are simulated), optionally
+    # dividend-adjusted like yfinance's auto_adjust.
+    def _actions(self, ticker: str, start, end, period, interval: str, auto_adjust: bool) -> pd.DataFrame:
+        df = self.bars(ticker, start, end, period, interval).copy()
+        if interval == "1d":
+            # Dividends are sized off the full path, so a shorter window sees the same payments.
+            _, end_ts = self._window(start, end, period)
+            full = self.bars(ticker, synthetic.ORIGIN, end_ts, None, "1d")["Close"]
+            df["Dividends"] = synthetic.quarterly_dividends(full, self.dividend_yield).reindex(df.index)
+        else:
+            df["Dividends"] = 0.0
+        df["Stock Splits"] = 0.0
+        return adjust_history(df) if auto_adjust else df
+
+    def download(self, tickers, start=None, end=None, period=None, interval: str = "1d",
+                 auto_adjust: bool = True, **_) -> pd.DataFrame:
+        symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+        symbols = [s.upper() for t in symbols for s in re.split(r"[, ]+", t.strip()) if s]
+        frames = {t: self._actions(t, start, end, period, interval, auto_adjust).drop(columns=["Dividends", "Stock Splits"])
+                  for t in symbols}
+        # Outer join on dates like yfinance: gaps and pre-IPO dates show up as NaN.
+        df = pd.concat(frames, axis=1, names=["Ticker", "Price"])
+        if df.empty:
+            return df
+        df = df.swaplevel(0, 1, axis=1)
+        fields = ["Close", "High", "Low", "Open", "Volume"]
+        return df.reindex(columns=pd.MultiIndex.from_product([fields, symbols], names=["Price", "Ticker"]))
+
+    def history(self, ticker: str, start=None, end=None, period="1mo", interval: str = "1d",
+                auto_adjust: bool = True, **_) -> pd.DataFrame:
+        df = self._actions(ticker, start, end, None if start is not None else period, interval, auto_adjust)
+        # Ticker.history returns exchange-local, timezone-aware timestamps. The synthetic intraday
+        # clock has no DST gaps or repeats, so it is read as UTC and converted: localizing it
+        # directly fails on the spring-forward hour and is ambiguous on the fall-back one.
+        if interval in synthetic.INTRADAY:
+            df.index = df.index.tz_localize("UTC").tz_convert("America/New_York")
+        else:
+            df.index = df.index.tz_localize("America/New_York")
+        df.index.name = "Date"
+        return df
+
+
+# Translate a yfinance period string ("20d", "6mo", "5y", "ytd", "max") into a start timestamp.
+def period_start(period: str, end: pd.Timestamp) -> pd.Timestamp:
+    if period == "max":
+        return synthetic.ORIGIN
+    if period == "ytd":
+        return pd.Timestamp(year=end.year, month=1, day=1)
+    m = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not m:
+        raise ValueError(f"Unsupported period {period!r}")
+    n, unit = int(m.group(1)), m.group(2)
+    offset = {
+        "d": pd.DateOffset(days=n),
+        "wk": pd.DateOffset(weeks=n),
+        "mo": pd.DateOffset(months=n),
+        "y": pd.DateOffset(years=n),
+    }[unit]
+    return end - offset
+
+
+def make_provider(name: str):
+    name = (name or "yahoo").lower()
+    if name == "yahoo":
+        return YahooProvider()
+    if name == "synthetic":
+        return SyntheticProvider(seed=int(os.environ.get(SEED_ENV, "0")))
+    raise ValueError(f"Unknown data provider {name!r}; expected 'yahoo' or 'synthetic'")
+
+
+_provider = None
+
+
+# The process-wide provider, chosen from $STOCK_DATA_PROVIDER on first use.
+def get_provider():
+    global _provider
+    if _provider is None:
+        _provider = make_provider(os.environ.get(PROVIDER_ENV, "yahoo"))
+    return _provider
+
+
+# Swap the provider, e.g. a SyntheticProvider with a pinned as_of for a load test.
+def set_provider(provider) -> None:
+    global _provider
+    _provider = provider
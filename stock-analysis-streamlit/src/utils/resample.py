@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from utils.shared_store import SharedFrame, share_frame
+
+# ----------------------------
+# Local OHLCV resampling.
+# Weekly/monthly (or coarser intraday) bars are aggregated from cached finer bars instead of
+# being downloaded again: first open, max high, min low, last close, summed volume.
+# Labels follow Yahoo: weekly bars start on Monday, monthly bars on the 1st.
+# ----------------------------
+
+# yfinance interval -> pandas resample rule. Bins are closed and labelled on the left.
+RESAMPLE_RULES = {
+    "2m": "2min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "60m": "h",
+    "1h": "h",
+    "1d": "D",
+    "1wk": "W-MON",
+    "1mo": "MS",
+    "3mo": "QS",
+}
+
+# How each OHLCV field aggregates. Fields not listed keep their last value.
+FIELD_AGG = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Adj Close": "last",
+    "Volume": "sum",
+    "Dividends": "sum",
+}
+
+
+# Aggregate `df` (single-level OHLCV columns, or yfinance's (Price, Ticker) MultiIndex) to a
+# coarser `interval`. Bins without any bar (weekends, holidays, pre-IPO) are dropped.
+def resample_ohlcv(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    if interval not in RESAMPLE_RULES:
+        raise ValueError(f"Cannot resample to {interval!r}; expected one of {list(RESAMPLE_RULES)}")
+    if df.empty:
+        return df
+    multi = isinstance(df.columns, pd.MultiIndex)
+    how = {col: FIELD_AGG.get(str(col[0] if multi else col), "last") for col in df.columns}
+    resampler = df.resample(RESAMPLE_RULES[interval], label="left", closed="left")
+    out = resampler.agg(how)
+    # A column with no bars in a bin is missing there (sum would otherwise report 0 volume).
+    out = out.where(resampler.count() > 0)
+    out = out.dropna(how="all")
+    out.index.name = df.index.name
+    return out
+
+
+# Resampled bars for a shared history, cached (and shared across sessions) per interval, so
+# switching intervals back and forth is a dictionary lookup after the first time.
+def resampled(handle: SharedFrame, interval: str) -> SharedFrame:
+    return share_frame((handle.key, "resample", interval), lambda: resample_ohlcv(handle.frame(), interval))
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Portfolio risk metrics.
+# Every measure is computed for all columns of a (bars x assets) return matrix at once, in one
+# vectorised pass: the tickers and the Portfolio column are just columns. Returns are simple
+# per-bar returns (pct_change), already cleaned of NaNs.
+#
+# RiskStream keeps the same metrics up to date bar by bar, for data that keeps arriving.
+# ----------------------------
+
+# Trading days per year, used to annualise Sharpe/Sortino.
+PERIODS_PER_YEAR = 252
+# Default rolling window (bars), roughly one trading month.
+ROLLING_WINDOW = 21
+# Default VaR/CVaR confidence level.
+CONFIDENCE = 0.95
+
+# Point metrics, in display order, with a human-readable label.
+METRIC_LABELS = {
+    "mean": "Average Return",
+    "volatility": "Volatility (Std Dev)",
+    "total_return": "Total Return",
+    "max_drawdown": "Max Drawdown",
+    "max_drawdown_duration": "Max Drawdown Duration (bars)",
+    "var_historical": "VaR (historical)",
+    "cvar_historical": "CVaR (historical)",
+    "var_parametric": "VaR (parametric)",
+    "cvar_parametric": "CVaR (parametric)",
+    "sharpe": "Sharpe Ratio",
+    "sortino": "Sortino Ratio",
+}
+
+
+def _as_matrix(returns) -> np.ndarray:
+    r = np.asarray(returns, dtype=np.float64)
+    if r.ndim == 1:
+        r = r[:, None]
+    if r.ndim != 2:
+        raise ValueError(f"Expected a (bars x assets) return matrix, got shape {r.shape}")
+    if not np.isfinite(r).all():
+        raise ValueError("Returns must be finite. Drop missing bars before computing risk metrics.")
+    return r
+
+
+# Metrics that only need the running moments, shared by the batch and streaming paths.
+# Arguments are per-column arrays; everything returned is per-column too.
+def _moment_metrics(n, mean, var, downside_sq, rf, confidence, periods_per_year) -> dict:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(var) if n > 1 else np.full_like(mean, np.nan)
+        downside = np.sqrt(downside_sq / n) if n else np.full_like(mean, np.nan)
+        excess = mean - rf
+        z = NormalDist().inv_cdf(1 - confidence)
+        tail = NormalDist().pdf(z) / (1 - confidence)
+        return {
+            "mean": mean,
+            "volatility": std,
+            # Losses are reported as positive numbers: a 95% VaR of 0.02 means "lose 2% or more
+            # on 5% of days".
+            "var_parametric": -(mean + z * std),
+            "cvar_parametric": -(mean - tail * std),
+            "sharpe": excess / std * np.sqrt(periods_per_year),
+            "sortino": excess / downside * np.sqrt(periods_per_year),
+        }
+
+
+# Historical VaR is the loss at the (1 - confidence) quantile; CVaR is the mean loss beyond it.
+def _historical_tail(r: np.ndarray, confidence: float) -> tuple[np.ndarray, np.ndarray]:
+    if r.shape[0] == 0:
+        nan = np.full(r.shape[1], np.nan)
+        return nan, nan
+    q = np.quantile(r, 1 - confidence, axis=0)
+    tail = r <= q
+    cvar = -(np.where(tail, r, 0.0).sum(axis=0) / tail.sum(axis=0))
+    return -q, cvar
+
+
+# Rolling sample standard deviation over `window` bars, NaN during warm-up.
+# Windowed sums come from prefix sums, so the cost is O(n) whatever the window.
+def rolling_volatility(returns, window: int = ROLLING_WINDOW) -> np.ndarray:
+    r = _as_matrix(returns)
+    n = r.shape[0]
+    out = np.full(r.shape, np.nan)
+    if window < 2 or window > n:
+        return out
+    # Centring first keeps the sum-of-squares difference from cancelling catastrophically.
+    x = r - r.mean(axis=0)
+    s = _window_sums(x, window)
+    ss = _window_sums(x * x, window)
+    out[window - 1:] = np.sqrt(np.maximum(ss - s * s / window, 0.0) / (window - 1))
+    return out
+
+
+# Rolling correlation of every column against column `ref` (by default the last one, e.g.
+# the Portfolio), over `window` bars. NaN during warm-up or where a window has no variance.
+def rolling_correlation(returns, window: int = ROLLING_WINDOW, ref: int = -1) -> np.ndarray:
+    r = _as_matrix(returns)
+    n = r.shape[0]
+    out = np.full(r.shape, np.nan)
+    if window < 2 or window > n:
+        return out
+    x = r - r.mean(axis=0)
+    y = x[:, [ref]]
+    sx, sy = _window_sums(x, window), _window_sums(y, window)
+    sxx, syy = _window_sums(x * x, window), _window_sums(y * y, window)
+    sxy = _window_sums(x * y, window)
+    cov = sxy - sx * sy / window
+    var_x = np.maximum(sxx - sx * sx / window, 0.0)
+    var_y = np.maximum(syy - sy * sy / window, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.sqrt(var_x * var_y)
+    out[window - 1:] = np.clip(corr, -1.0, 1.0)
+    return out
+
+
+def _window_sums(x: np.ndarray, window: int) -> np.ndarray:
+    csum = np.concatenate((np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)))
+    return csum[window:] - csum[:-window]
+
+
+# Every point metric for every column of `returns` in one sweep. Returns {metric: array(k)}.
+# `risk_free` is per bar (e.g. annual rate / 252). Drawdowns are measured on the compounded
+# wealth path starting from 1, so a loss on the very first bar counts.
+def risk_metrics(returns, risk_free: float = 0.0, confidence: float = CONFIDENCE,
+                 periods_per_year: int = PERIODS_PER_YEAR) -> dict:
+    r = _as_matrix(returns)
+    n, k = r.shape
+    mean = r.mean(axis=0) if n else np.full(k, np.nan)
+    var = r.var(axis=0, ddof=1) if n > 1 else np.full(k, np.nan)
+    downside_sq = (np.minimum(r - risk_free, 0.0) ** 2).sum(axis=0)
+    metrics = _moment_metrics(n, mean, var, downside_sq, risk_free, confidence, periods_per_year)
+
+    wealth = np.vstack((np.ones((1, k)), np.cumprod(1.0 + r, axis=0)))
+    peak = np.maximum.accumulate(wealth, axis=0)
+    # Bars since the last peak: the index of the latest bar at a peak, carried forward.
+    t = np.arange(n + 1)[:, None]
+    last_peak = np.maximum.accumulate(np.where(wealth >= peak, t, 0), axis=0)
+    metrics["total_return"] = wealth[-1] - 1.0
+    metrics["max_drawdown"] = -(wealth / peak - 1.0).min(axis=0)
+    metrics["max_drawdown_duration"] = (t - last_peak).max(axis=0).astype(np.float64)
+    metrics["var_historical"], metrics["cvar_historical"] = _historical_tail(r, confidence)
+    return metrics
+
+
+# risk_metrics for a returns DataFrame, as a metrics x columns table with readable labels.
+# Pass already computed `metrics` to only format them.
+def metrics_table(returns: pd.DataFrame, metrics: dict | None = None, **kwargs) -> pd.DataFrame:
+    if metrics is None:
+        metrics = risk_metrics(returns.to_numpy(), **kwargs)
+    return pd.DataFrame([metrics[m] for m in METRIC_LABELS],
+                        index=list(METRIC_LABELS.values()), columns=returns.columns)
+
+
+class RiskStream:
+    # Incrementally updated risk metrics for `columns` (tickers, Portfolio, ...).
+    # update()/extend() cost O(columns) per bar for the moments and drawdowns; the bars are also
+    # kept in a growing buffer because historical VaR and the rolling window need them.
+    # metrics() returns the same numbers as risk_metrics() over all bars seen so far.
+    def __init__(self, columns, window: int = ROLLING_WINDOW, risk_free: float = 0.0,
+                 confidence: float = CONFIDENCE, periods_per_year: int = PERIODS_PER_YEAR):
+        self.columns = list(columns)
+        self.window = window
+        self.risk_free = risk_free
+        self.confidence = confidence
+        self.periods_per_year = periods_per_year
+        k = len(self.columns)
+        self.n = 0
+        self._mean = np.zeros(k)
+        self._m2 = np.zeros(k)
+        self._downside_sq = np.zeros(k)
+        self._wealth = np.ones(k)
+        self._peak = np.ones(k)
+        self._since_peak = np.zeros(k)
+        self._max_drawdown = np.zeros(k)
+        self._max_duration = np.zeros(k)
+        self._buffer = np.empty((64, k))
+
+    # Add one bar of returns (one value per column).
+    def update(self, bar) -> None:
+        r = np.asarray(bar, dtype=np.float64).reshape(-1)
+        if r.shape[0] != len(self.columns):
+            raise ValueError(f"Expected {len(self.columns)} returns per bar, got {r.shape[0]}")
+        if not np.isfinite(r).all():
+            raise ValueError("Returns must be finite. Drop missing bars before streaming them.")
+        if self.n == self._buffer.shape[0]:
+            self._buffer = np.concatenate((self._buffer, np.empty_like(self._buffer)))
+        self._buffer[self.n] = r
+        self.n += 1
+        # Welford's update keeps the variance accurate over long streams.
+        delta = r - self._mean
+        self._mean += delta / self.n
+        self._m2 += delta * (r - self._mean)
+        self._downside_sq += np.minimum(r - self.risk_free, 0.0) ** 2
+        self._wealth *= 1.0 + r
+        at_peak = self._wealth >= self._peak
+        self._peak = np.where(at_peak, self._wealth, self._peak)
+        self._since_peak = np.where(at_peak, 0.0, self._since_peak + 1)
+        self._max_drawdown = np.maximum(self._max_drawdown, 1.0 - self._wealth / self._peak)
+        self._max_duration = np.maximum(self._max_duration, self._since_peak)
+
+    def extend(self, bars) -> None:
+        for bar in np.asarray(bars, dtype=np.float64).reshape(-1, len(self.columns)):
+            self.update(bar)
+
+    @property
+    def returns(self) -> np.ndarray:
+        return self._buffer[:self.n]
+
+    def metrics(self) -> dict:
+        var = self._m2 / (self.n - 1) if self.n > 1 else np.full(len(self.columns), np.nan)
+        mean = self._mean if self.n else np.full(len(self.columns), np.nan)
+        metrics = _moment_metrics(self.n, mean, var, self._downside_sq,
+                                  self.risk_free, self.confidence, self.periods_per_year)
+        metrics["total_return"] = self._wealth - 1.0
+        metrics["max_drawdown"] = self._max_drawdown.copy()
+        metrics["max_drawdown_duration"] = self._max_duration.copy()
+        metrics["var_historical"], metrics["cvar_historical"] = _historical_tail(self.returns, self.confidence)
+        # Latest rolling values only; the full history is rolling_volatility(stream.returns).
+        recent = self.returns[-self.window:]
+        if self.n >= self.window:
+            metrics["rolling_volatility"] = rolling_volatility(recent, self.window)[-1]
+            metrics["rolling_correlation"] = rolling_correlation(recent, self.window)[-1]
+        else:
+            metrics["rolling_volatility"] = np.full(len(self.columns), np.nan)
+            metrics["rolling_correlation"] = np.full(len(self.columns), np.nan)
+        return metrics
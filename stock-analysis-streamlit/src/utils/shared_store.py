@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Process-wide store of immutable price and indicator arrays.
+# Every Streamlit session runs in the same server process, so fifty users looking at AAPL can
+# share one read-only copy of its history instead of holding fifty. Sessions get zero-copy
+# DataFrame views over the shared arrays; only genuinely session-specific results are private.
+#
+# Entries are reference counted: every array handed out (and every frame or view made from it)
+# pins its entry for as long as it is alive, and the least recently used unpinned entries are
+# evicted once the store is over its byte budget.
+# With a backing directory, arrays live in memory-mapped .npy files instead of the Python heap,
+# so several server processes on one machine share the same pages through the OS page cache:
+# a process that misses in memory maps the file another process already wrote instead of
+# building it again. Files are written under a temporary name and renamed into place, so a
+# mapped file is never truncated or rewritten underneath a reader.
+# ----------------------------
+
+# Byte budget before unpinned entries are evicted (default 512 MB).
+MAX_BYTES_ENV = "STOCK_SHARED_MAX_BYTES"
+# Directory for memory-mapped backing files; unset keeps arrays in process memory.
+SHARED_DIR_ENV = "STOCK_SHARED_DIR"
+
+
+class _Entry:
+    def __init__(self, values: np.ndarray, index: pd.Index | None, columns: pd.Index | None, path: str | None):
+        self.values = values
+        self.index = index
+        self.columns = columns
+        self.path = path
+        self.refs = 0
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.values.nbytes)
+
+    def remove_files(self) -> None:
+        # Open views keep the mapping alive; unlinking only removes the name.
+        if self.path:
+            for path in (self.path, _meta_path(self.path)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# Sidecar holding the index and columns of a memory-mapped entry.
+def _meta_path(path: str) -> str:
+    return path[:-len(".npy")] + ".meta"
+
+
+# Exposes an entry's values to numpy while holding one pin on it. Arrays made from it keep it
+# alive through their .base chain, as do frames and slices over those arrays, so the pin is only
+# released once the last view of the shared data is gone.
+class _Pin:
+    def __init__(self, store: SharedArrayStore, key: Hashable, entry: _Entry):
+        self.values = entry.values
+        self.__array_interface__ = entry.values.__array_interface__
+        weakref.finalize(self, store.release, key)
+
+
+# Write through a temporary file and an atomic rename, so readers see the old file or the new one.
+def _write_atomic(path: str, write: Callable) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class SharedArrayStore:
+    def __init__(self, max_bytes: int = 512 * 2**20, directory: str | None = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._lock = threading.RLock()
+        # Per-key build locks, so concurrent sessions asking for the same key build it once.
+        self._building: dict[Hashable, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.file_hits = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def _path(self, key: Hashable) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.npy")
+
+    # The entry another process already wrote for `key`, memory-mapped read-only, or None.
+    # The sidecar is written first, so a visible .npy always has its index and columns.
+    def _load_file(self, key: Hashable) -> _Entry | None:
+        path = self._path(key)
+        try:
+            with open(_meta_path(path), "rb") as f:
+                index, columns = pickle.load(f)
+            values = np.load(path, mmap_mode="r")
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return None
+        return _Entry(values, index, columns, path)
+
+    # Freeze `values` into the store. The array is copied once (into a file when memory-mapped)
+    # and marked read-only, so no session can mutate what the others see.
+    def _make_entry(self, key: Hashable, values: np.ndarray, index=None, columns=None) -> _Entry:
+        values = np.ascontiguousarray(values)
+        path = None
+        if self.directory:
+            path = self._path(key)
+            _write_atomic(_meta_path(path), lambda f: pickle.dump((index, columns), f))
+            _write_atomic(path, lambda f: np.save(f, values))
+            values = np.load(path, mmap_mode="r")
+        else:
+            if values.flags.writeable and values.base is not None:
+                values = values.copy()
+            values.flags.writeable = False
+        return _Entry(values, index, columns, path)
+
+    def _lookup(self, key: Hashable) -> _Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.refs += 1
+                self.hits += 1
+            return entry
+
+    # Return the entry for `key`, calling `build()` -> (values, index, columns) only on a miss.
+    # The entry comes back pinned (before any eviction can see it); the caller owns that pin and
+    # hands it to _pinned().
+    def _get_or_build(self, key: Hashable, build: Callable[[], tuple]) -> _Entry:
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        with build_lock:
+            # Another session may have built it while we waited.
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+            try:
+                # ...or another process, when the store is backed by files.
+                entry = self._load_file(key) if self.directory else None
+                if entry is None:
+                    values, index, columns = build()
+                    entry = self._make_entry(key, values, index, columns)
+                    built = True
+                else:
+                    built = False
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+            with self._lock:
+                if built:
+                    self.misses += 1
+                else:
+                    self.file_hits += 1
+                entry.refs += 1
+                self._entries[key] = entry
+                self._evict()
+            return entry
+
+    # A read-only array over the entry's values that holds the pin _get_or_build took.
+    def _pinned(self, key: Hashable, entry: _Entry) -> np.ndarray:
+        return np.asarray(_Pin(self, key, entry))
+
+    def release(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+            self._evict()
+
+    # Drop least recently used, unpinned entries until the store fits its budget again.
+    def _evict(self) -> None:
+        total = sum(e.nbytes for e in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs:
+                continue
+            del self._entries[key]
+            total -= entry.nbytes
+            self.evictions += 1
+            entry.remove_files()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e.nbytes for e in self._entries.values()),
+                "pinned": sum(1 for e in self._entries.values() if e.refs),
+                "hits": self.hits,
+                "misses": self.misses,
+                "file_hits": self.file_hits,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if not e.refs]:
+                self._entries.pop(key).remove_files()
+
+
+# A session's handle on a shared frame. The handle and every frame it hands out pin the entry;
+# the pin is released once they have all been garbage collected (e.g. when the session and its
+# state go away).
+class SharedFrame:
+    def __init__(self, key: Hashable, values: np.ndarray, index: pd.Index | None, columns: pd.Index | None):
+        self.key = key
+        self._values = values
+        self._index = index
+        self._columns = columns
+
+    # Zero-copy DataFrame over the shared, read-only values. Operations that change data
+    # produce new session-private frames (pandas copy-on-write); the shared block is never written.
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self._values, index=self._index, columns=self._columns, copy=False)
+
+
+# Share a numeric DataFrame under `key`; `build()` only runs when no session has built it yet.
+# Columns are stored as one float64 block (Volume included), the index is shared as-is
+# (pandas Index objects are immutable).
+def share_frame(key: Hashable, build: Callable[[], pd.DataFrame], store: SharedArrayStore | None = None) -> SharedFrame:
+    store = store or get_store()
+
+    def build_frame():
+        df = build()
+        return df.to_numpy(dtype=np.float64), df.index, df.columns
+
+    entry = store._get_or_build(("frame", key), build_frame)
+    return SharedFrame(("frame", key), store._pinned(("frame", key), entry), entry.index, entry.columns)
+
+
+# Share a derived 1-D/2-D indicator array (e.g. an SMA) under `key`. Returned read-only; the
+# array and any view of it pin the entry.
+def share_array(key: Hashable, build: Callable[[], np.ndarray], store: SharedArrayStore | None = None) -> np.ndarray:
+    store = store or get_store()
+    entry = store._get_or_build(("array", key), lambda: (np.asarray(build(), dtype=np.float64), None, None))
+    return store._pinned(("array", key), entry)
+
+
+_store: SharedArrayStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SharedArrayStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SharedArrayStore(
+                max_bytes=int(os.environ.get(MAX_BYTES_ENV, 512 * 2**20)),
+                directory=os.environ.get(SHARED_DIR_ENV) or None,
+            )
+        return _store
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Deterministic synthetic OHLCV generator.
+# Prices follow a geometric random walk seeded from (ticker, seed), so the same request always
+# returns the same bars, with or without network. Everything is vectorised: a few million bars
+# per ticker take well under a second.
+# ----------------------------
+
+# yfinance interval -> pandas frequency. Daily bars skip weekends like a real exchange calendar.
+INTERVAL_FREQ = {
+    "1m": "min",
+    "2m": "2min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "60m": "h",
+    "1h": "h",
+    "1d": "B",
+    "5d": "5B",
+    "1wk": "W-MON",
+    "1mo": "MS",
+    "3mo": "QS",
+}
+INTRADAY = {"1m", "2m", "5m", "15m", "30m", "60m", "1h"}
+# Length of one bar in trading days. Intraday bars run on a continuous clock (no market hours),
+# so a day holds 1440 one-minute bars.
+BAR_DAYS = {
+    "1m": 1 / 1440,
+    "2m": 2 / 1440,
+    "5m": 5 / 1440,
+    "15m": 15 / 1440,
+    "30m": 30 / 1440,
+    "60m": 1 / 24,
+    "1h": 1 / 24,
+    "1d": 1.0,
+    "5d": 5.0,
+    "1wk": 5.0,
+    "1mo": 21.0,
+    "3mo": 63.0,
+}
+
+# Daily and coarser series all start here, so any date range is a slice of one fixed path.
+ORIGIN = pd.Timestamp("2000-01-03")
+# Yahoo only serves the last 60 days of intraday bars; the synthetic paths do the same.
+INTRADAY_DAYS = 60
+
+
+def ticker_seed(ticker: str, seed: int = 0) -> int:
+    # crc32 rather than hash(): str hashes are salted per process.
+    return zlib.crc32(ticker.upper().encode("utf-8")) ^ (seed & 0xFFFFFFFF)
+
+
+# Fixed-frequency bar timestamps for an interval, either up to `end` (exclusive) or `periods` long.
+def bar_index(interval: str, start: pd.Timestamp, end: pd.Timestamp | None = None,
+              periods: int | None = None) -> pd.DatetimeIndex:
+    if interval not in INTERVAL_FREQ:
+        raise ValueError(f"Unsupported interval {interval!r}; expected one of {list(INTERVAL_FREQ)}")
+    if (end is None) == (periods is None):
+        raise ValueError("Pass exactly one of end or periods")
+    freq = INTERVAL_FREQ[interval]
+    if periods is not None:
+        return pd.date_range(start, periods=periods, freq=freq)
+    return pd.date_range(start, end, freq=freq, inclusive="left")
+
+
+# Generate OHLCV bars on `index` for one ticker.
+#   interval:   the bar size of `index`; volatility and drift are scaled from daily to per-bar.
+#   volatility: daily std-dev of log returns; drift: daily mean log return.
+#   gap_prob:   probability that a bar is missing (halts, holidays, bad prints); those rows are dropped.
+#   ipo:        rows before this timestamp are dropped, as if the ticker did not trade yet.
+def generate_ohlcv(ticker: str, index: pd.DatetimeIndex, interval: str = "1d", *, volatility: float = 0.02,
+                   drift: float = 0.0003, gap_prob: float = 0.0, ipo: pd.Timestamp | str | None = None,
+                   seed: int = 0) -> pd.DataFrame:
+    if interval not in BAR_DAYS:
+        raise ValueError(f"Unsupported interval {interval!r}; expected one of {list(BAR_DAYS)}")
+    if volatility < 0:
+        raise ValueError("volatility must be non-negative")
+    if not 0.0 <= gap_prob < 1.0:
+        raise ValueError("gap_prob must be in [0, 1)")
+
+    rng = np.random.default_rng(ticker_seed(ticker, seed))
+    n = len(index)
+    start_price = rng.uniform(20.0, 400.0)
+    bar_days = BAR_DAYS[interval]
+    drift *= bar_days
+    volatility *= np.sqrt(bar_days)
+
+    # Close: cumulative log returns. Open: previous close plus an overnight gap.
+    log_ret = rng.normal(drift, volatility, n)
+    close = start_price * np.exp(np.cumsum(log_ret))
+    open_ = np.empty(n)
+    open_[:1] = start_price
+    open_[1:] = close[:-1]
+    open_ *= np.exp(rng.normal(0.0, volatility * 0.25, n))
+    # High/Low: stretch beyond the open-close body by a half-normal wick.
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0.0, volatility * 0.5, n)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0.0, volatility * 0.5, n)))
+    volume = np.rint(rng.lognormal(np.log(1e6), 0.5, n))
+
+    keep = rng.random(n) >= gap_prob
+    if ipo is not None:
+        keep &= index >= pd.Timestamp(ipo)
+
+    df = pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=index,
+    )
+    return df[keep]
+
+
+# Where the fixed path for an interval begins, relative to the provider's "today".
+def series_origin(interval: str, as_of: pd.Timestamp) -> pd.Timestamp:
+    if interval in INTRADAY:
+        return (as_of - pd.Timedelta(days=INTRADAY_DAYS)).normalize()
+    return ORIGIN
+
+
+# Quarterly cash dividends for a daily close series: paid on the first bar of each calendar
+# quarter, sized at a quarter of `annual_yield` of the previous close. Zero everywhere else.
+def quarterly_dividends(close: pd.Series, annual_yield: float) -> pd.Series:
+    dividends = pd.Series(0.0, index=close.index)
+    if annual_yield <= 0 or len(close) < 2:
+        return dividends
+    quarter = close.index.to_period("Q")
+    first = np.flatnonzero(quarter[1:] != quarter[:-1]) + 1
+    dividends.iloc[first] = close.to_numpy()[first - 1] * annual_yield / 4
+    return dividends